@@ -13,7 +13,7 @@ from alembic import context
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import Base
-from app.models import User, Reel, ReelHistory, ParseJob  # noqa: F401
+from app.models import User, Reel, ReelHistory, ParseJob, ReelHistoryHourly, ReelHistoryDaily, ReelHistoryPacked, RollupState, UserStats  # noqa: F401
 
 config = context.config
 
@@ -0,0 +1,26 @@
+"""parse_jobs.heartbeat_at lease renewal
+
+Revision ID: 0c5e7a9b2d41
+Revises: 6e0a2c4f8d17
+Create Date: 2026-10-20 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c5e7a9b2d41'
+down_revision: Union[str, None] = '6e0a2c4f8d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('parse_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('parse_jobs', 'heartbeat_at')
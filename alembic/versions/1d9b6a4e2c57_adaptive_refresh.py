@@ -0,0 +1,32 @@
+"""velocity-adaptive refresh columns
+
+Revision ID: 1d9b6a4e2c57
+Revises: e5a2f7c3d914
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1d9b6a4e2c57'
+down_revision: Union[str, None] = 'e5a2f7c3d914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reels', sa.Column('views_velocity', sa.Float(), nullable=False, server_default='0'))
+    op.alter_column('reels', 'views_velocity', server_default=None)
+    op.add_column('reels', sa.Column('parse_interval_minutes', sa.Float(), nullable=True))
+    op.add_column('users', sa.Column('parse_budget_factor', sa.Float(), nullable=False, server_default='1'))
+    op.alter_column('users', 'parse_budget_factor', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'parse_budget_factor')
+    op.drop_column('reels', 'parse_interval_minutes')
+    op.drop_column('reels', 'views_velocity')
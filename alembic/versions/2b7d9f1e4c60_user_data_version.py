@@ -0,0 +1,30 @@
+"""users.data_version for conditional GET
+
+Revision ID: 2b7d9f1e4c60
+Revises: f1b3d5e7a940
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7d9f1e4c60'
+down_revision: Union[str, None] = 'f1b3d5e7a940'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('data_version', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.alter_column('users', 'data_version', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,36 @@
+"""reels.next_parse_at for set-based scheduling
+
+Revision ID: 3f1a9c2d7b10
+Revises:
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Существующие рилсы считаем созревшими сразу
+    op.add_column(
+        'reels',
+        sa.Column('next_parse_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.alter_column('reels', 'next_parse_at', server_default=None)
+    op.create_index(
+        'ix_reels_next_parse_at', 'reels', ['next_parse_at'],
+        postgresql_where=sa.text('enabled'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reels_next_parse_at', table_name='reels')
+    op.drop_column('reels', 'next_parse_at')
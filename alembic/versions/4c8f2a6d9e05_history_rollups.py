@@ -0,0 +1,46 @@
+"""hourly/daily rollups of reel_history
+
+Revision ID: 4c8f2a6d9e05
+Revises: b6e8d1f4a7c3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8f2a6d9e05'
+down_revision: Union[str, None] = 'b6e8d1f4a7c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _rollup_columns():
+    columns = [
+        sa.Column('reel_id', sa.Integer(), sa.ForeignKey('reels.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('bucket_start', sa.DateTime(), primary_key=True),
+    ]
+    for name in ('views', 'likes', 'comments', 'shares'):
+        for agg in ('min', 'max', 'last'):
+            columns.append(sa.Column(f'{name}_{agg}', sa.Integer(), nullable=False))
+    columns.append(sa.Column('last_at', sa.DateTime(), nullable=False))
+    return columns
+
+
+def upgrade() -> None:
+    op.create_table('reel_history_hourly', *_rollup_columns())
+    op.create_table('reel_history_daily', *_rollup_columns())
+    op.create_table(
+        'rollup_state',
+        sa.Column('name', sa.String(50), primary_key=True),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rollup_state')
+    op.drop_table('reel_history_daily')
+    op.drop_table('reel_history_hourly')
@@ -0,0 +1,62 @@
+"""reel_history.carried_from for points carried over dropped partitions
+
+Revision ID: 5b8d1f3e7a20
+Revises: 0c5e7a9b2d41
+Create Date: 2026-10-20 02:00:00.000000
+
+Если БД ещё в фазе теневой таблицы (9e1b7c3a5d28, до partition_history
+swap), колонка добавляется и в reel_history_new, а триггер-зеркало
+пересоздаётся с ней — иначе после swap живая таблица останется без
+carried_from.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8d1f3e7a20'
+down_revision: Union[str, None] = '0c5e7a9b2d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_MIRROR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION reel_history_mirror() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM reel_history_new WHERE id = OLD.id AND parsed_at = OLD.parsed_at;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO reel_history_new
+                (id, reel_id, views, likes, comments, shares, observed, parsed_at, last_confirmed_at{columns})
+            VALUES
+                (NEW.id, NEW.reel_id, NEW.views, NEW.likes, NEW.comments, NEW.shares,
+                 NEW.observed, NEW.parsed_at, NEW.last_confirmed_at{values})
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+
+def _shadow_table_exists() -> bool:
+    return op.get_bind().execute(sa.text("SELECT to_regclass('public.reel_history_new')")).scalar() is not None
+
+
+def upgrade() -> None:
+    op.add_column('reel_history', sa.Column('carried_from', sa.DateTime(), nullable=True))
+
+    if _shadow_table_exists():
+        op.add_column('reel_history_new', sa.Column('carried_from', sa.DateTime(), nullable=True))
+        op.execute(_MIRROR_FUNCTION.format(columns=", carried_from", values=", NEW.carried_from"))
+
+
+def downgrade() -> None:
+    if _shadow_table_exists():
+        op.execute(_MIRROR_FUNCTION.format(columns="", values=""))
+        op.drop_column('reel_history_new', 'carried_from')
+
+    op.drop_column('reel_history', 'carried_from')
@@ -0,0 +1,35 @@
+"""array-packed daily rows of reel_history
+
+Revision ID: 5f3d8a1c6b94
+Revises: 9e1b7c3a5d28
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3d8a1c6b94'
+down_revision: Union[str, None] = '9e1b7c3a5d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reel_history_packed',
+        sa.Column('reel_id', sa.Integer(), sa.ForeignKey('reels.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.DateTime(), primary_key=True),
+        *[
+            sa.Column(name, postgresql.ARRAY(sa.Integer()), nullable=False)
+            for name in ('offsets', 'confirmed', 'views', 'likes', 'comments', 'shares', 'observed')
+        ],
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reel_history_packed')
@@ -0,0 +1,65 @@
+"""reels.engagement_rate and per-sort keyset indexes
+
+Revision ID: 6e0a2c4f8d17
+Revises: 2b7d9f1e4c60
+Create Date: 2026-10-20 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e0a2c4f8d17'
+down_revision: Union[str, None] = '2b7d9f1e4c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия app.models.reel.REEL_SORT_INDEXES на момент миграции
+SORT_INDEXES = {
+    "created_at": "created_at",
+    "views": "coalesce(views, 0)",
+    "likes": "coalesce(likes, 0)",
+    "comments": "coalesce(comments, 0)",
+    "shares": "coalesce(shares, 0)",
+    "views_velocity": "views_velocity",
+    "engagement_rate": "coalesce(engagement_rate, 0)",
+    "last_parsed_at": "coalesce(last_parsed_at, '1970-01-01 00:00:00'::timestamp)",
+    "title": "title",
+}
+
+
+def upgrade() -> None:
+    # Сохраняемый вычисляемый столбец: ALTER переписывает таблицу reels
+    op.add_column(
+        'reels',
+        sa.Column(
+            'engagement_rate',
+            sa.Float(),
+            sa.Computed(
+                "(coalesce(likes, 0) + coalesce(comments, 0) + coalesce(shares, 0))::float8 / nullif(views, 0)",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+
+    # Индексы строятся без блокировки записи
+    with op.get_context().autocommit_block():
+        for name, expr in SORT_INDEXES.items():
+            op.create_index(
+                f'ix_reels_user_sort_{name}',
+                'reels',
+                ['user_id', sa.text(expr), 'id'],
+                postgresql_include=['platform', 'enabled'],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in SORT_INDEXES:
+            op.drop_index(f'ix_reels_user_sort_{name}', table_name='reels', postgresql_concurrently=True)
+    op.drop_column('reels', 'engagement_rate')
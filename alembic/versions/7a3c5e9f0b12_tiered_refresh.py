@@ -0,0 +1,40 @@
+"""lite/full job types and observed metrics in history
+
+Revision ID: 7a3c5e9f0b12
+Revises: 1d9b6a4e2c57
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c5e9f0b12'
+down_revision: Union[str, None] = '1d9b6a4e2c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+jobtype = sa.Enum('FULL', 'LITE', name='jobtype')
+
+
+def upgrade() -> None:
+    jobtype.create(op.get_bind(), checkfirst=True)
+    op.add_column('parse_jobs', sa.Column('job_type', jobtype, nullable=False, server_default='FULL'))
+    op.alter_column('parse_jobs', 'job_type', server_default=None)
+
+    op.add_column('reels', sa.Column('next_full_parse_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    op.alter_column('reels', 'next_full_parse_at', server_default=None)
+
+    # Все старые точки истории — полные
+    op.add_column('reel_history', sa.Column('observed', sa.Integer(), nullable=False, server_default='15'))
+    op.alter_column('reel_history', 'observed', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('reel_history', 'observed')
+    op.drop_column('reels', 'next_full_parse_at')
+    op.drop_column('parse_jobs', 'job_type')
+    jobtype.drop(op.get_bind(), checkfirst=True)
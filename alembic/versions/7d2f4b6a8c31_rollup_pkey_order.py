@@ -0,0 +1,43 @@
+"""rollup tables: primary key in (reel_id, bucket_start) order
+
+Revision ID: 7d2f4b6a8c31
+Revises: 5b8d1f3e7a20
+Create Date: 2026-10-20 03:00:00.000000
+
+БД, созданные create_all до явного PrimaryKeyConstraint в RollupMixin,
+получили ключ (bucket_start, reel_id) — по нему выборка диапазона
+одного рилса индекс не использует. Ключ пересоздаётся в нужном порядке.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2f4b6a8c31'
+down_revision: Union[str, None] = '5b8d1f3e7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ('reel_history_hourly', 'reel_history_daily')
+
+
+def _pkey_first_column(table: str):
+    return op.get_bind().execute(sa.text(
+        "SELECT a.attname FROM pg_index i "
+        "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+        "WHERE i.indrelid = to_regclass(:table) AND i.indisprimary"
+    ), {"table": table}).scalar()
+
+
+def upgrade() -> None:
+    for table in ROLLUP_TABLES:
+        if _pkey_first_column(table) == 'bucket_start':
+            op.drop_constraint(f'{table}_pkey', table, type_='primary')
+            op.create_primary_key(f'{table}_pkey', table, ['reel_id', 'bucket_start'])
+
+
+def downgrade() -> None:
+    # Порядок (reel_id, bucket_start) совпадает с исходной миграцией — откатывать нечего
+    pass
@@ -0,0 +1,40 @@
+"""partial unique index on active parse_jobs
+
+Revision ID: 8b2e4d6f1a23
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d6f1a23'
+down_revision: Union[str, None] = '3f1a9c2d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Дубли, накопившиеся до индекса: оставляем самую раннюю активную задачу на рилс
+    op.execute("""
+        UPDATE parse_jobs SET status = 'FAILED', completed_at = now(),
+               error_message = 'Дубликат активной задачи'
+        WHERE status IN ('PENDING', 'RUNNING')
+          AND id NOT IN (
+              SELECT min(id) FROM parse_jobs
+              WHERE status IN ('PENDING', 'RUNNING')
+              GROUP BY reel_id
+          )
+    """)
+    op.create_index(
+        'uq_parse_jobs_active_reel', 'parse_jobs', ['reel_id'], unique=True,
+        postgresql_where=sa.text("status IN ('PENDING', 'RUNNING')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_parse_jobs_active_reel', table_name='parse_jobs')
@@ -0,0 +1,102 @@
+"""monthly RANGE partitioning of reel_history (shadow table)
+
+Revision ID: 9e1b7c3a5d28
+Revises: 4c8f2a6d9e05
+Create Date: 2026-10-19 18:00:00.000000
+
+Создаёт секционированную reel_history_new рядом с живой таблицей и
+триггер, зеркалирующий в неё все записи. Перенос старых строк и
+переключение таблиц — python -m app.tools.partition_history
+(backfill, затем swap), без долгой блокировки reel_history.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1b7c3a5d28'
+down_revision: Union[str, None] = '4c8f2a6d9e05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    relkind = bind.execute(sa.text(
+        "SELECT relkind FROM pg_class "
+        "WHERE relname = 'reel_history' AND relnamespace = 'public'::regnamespace"
+    )).scalar()
+    if relkind == 'p':
+        # Свежая БД: create_all уже создал секционированную таблицу
+        return
+
+    op.execute("""
+        CREATE TABLE reel_history_new (
+            id INTEGER NOT NULL DEFAULT nextval('reel_history_id_seq'),
+            reel_id INTEGER NOT NULL REFERENCES reels (id) ON DELETE CASCADE,
+            views INTEGER,
+            likes INTEGER,
+            comments INTEGER,
+            shares INTEGER,
+            observed INTEGER NOT NULL DEFAULT 15,
+            parsed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            last_confirmed_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT reel_history_new_pkey PRIMARY KEY (id, parsed_at)
+        ) PARTITION BY RANGE (parsed_at)
+    """)
+    op.execute("CREATE INDEX ix_reel_history_new_reel_parsed ON reel_history_new (reel_id, parsed_at)")
+    op.execute("CREATE INDEX ix_reel_history_new_id ON reel_history_new (id)")
+    op.execute("CREATE INDEX ix_reel_history_new_parsed_brin ON reel_history_new USING brin (parsed_at)")
+
+    # Помесячные секции от самой старой точки до +2 месяцев, остальное — в DEFAULT
+    oldest = bind.execute(sa.text("SELECT min(parsed_at) FROM reel_history")).scalar()
+    now = datetime.utcnow()
+    month = (oldest or now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), 2)
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE reel_history_y{month.year:04d}m{month.month:02d} PARTITION OF reel_history_new "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        month = end
+    op.execute("CREATE TABLE reel_history_default PARTITION OF reel_history_new DEFAULT")
+
+    # Зеркало записей в новую таблицу на время переноса
+    op.execute("""
+        CREATE FUNCTION reel_history_mirror() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM reel_history_new WHERE id = OLD.id AND parsed_at = OLD.parsed_at;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO reel_history_new
+                    (id, reel_id, views, likes, comments, shares, observed, parsed_at, last_confirmed_at)
+                VALUES
+                    (NEW.id, NEW.reel_id, NEW.views, NEW.likes, NEW.comments, NEW.shares,
+                     NEW.observed, NEW.parsed_at, NEW.last_confirmed_at)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER reel_history_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON reel_history
+        FOR EACH ROW EXECUTE FUNCTION reel_history_mirror()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS reel_history_mirror ON reel_history")
+    op.execute("DROP FUNCTION IF EXISTS reel_history_mirror()")
+    op.execute("DROP TABLE IF EXISTS reel_history_new")
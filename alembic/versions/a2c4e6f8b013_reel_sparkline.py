@@ -0,0 +1,45 @@
+"""reels.sparkline precomputed from hourly rollups
+
+Revision ID: a2c4e6f8b013
+Revises: 5f3d8a1c6b94
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2c4e6f8b013'
+down_revision: Union[str, None] = '5f3d8a1c6b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'reels',
+        sa.Column('sparkline', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False),
+    )
+    # Начальные спарклайны: последние 24 часовые корзины каждого рилса
+    op.execute("""
+        UPDATE reels SET sparkline = points.sparkline
+        FROM (
+            SELECT reel_id, array_agg(views_last ORDER BY bucket_start) AS sparkline
+            FROM (
+                SELECT reel_id, bucket_start, views_last,
+                       row_number() OVER (PARTITION BY reel_id ORDER BY bucket_start DESC) AS rn
+                FROM reel_history_hourly
+            ) ranked
+            WHERE rn <= 24
+            GROUP BY reel_id
+        ) points
+        WHERE reels.id = points.reel_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('reels', 'sparkline')
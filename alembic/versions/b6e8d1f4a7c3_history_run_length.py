@@ -0,0 +1,58 @@
+"""reel_history.last_confirmed_at and run-length compaction
+
+Revision ID: b6e8d1f4a7c3
+Revises: 7a3c5e9f0b12
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e8d1f4a7c3'
+down_revision: Union[str, None] = '7a3c5e9f0b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reel_history', sa.Column('last_confirmed_at', sa.DateTime(), nullable=True))
+
+    # Схлопываем подряд идущие одинаковые точки: голова отрезка получает
+    # last_confirmed_at = время последнего повтора, повторы удаляются
+    op.execute("""
+        CREATE TEMP TABLE history_runs ON COMMIT DROP AS
+        SELECT id, run_start, is_head,
+               max(parsed_at) OVER (PARTITION BY reel_id, run_start) AS run_end
+        FROM (
+            SELECT id, reel_id, parsed_at, is_head,
+                   sum(is_head::int) OVER (PARTITION BY reel_id ORDER BY parsed_at, id) AS run_start
+            FROM (
+                SELECT id, reel_id, parsed_at,
+                       (views, likes, comments, shares) IS DISTINCT FROM (
+                           lag(views) OVER w, lag(likes) OVER w,
+                           lag(comments) OVER w, lag(shares) OVER w
+                       ) AS is_head
+                FROM reel_history
+                WINDOW w AS (PARTITION BY reel_id ORDER BY parsed_at, id)
+            ) marked
+        ) numbered
+    """)
+    op.execute("""
+        UPDATE reel_history h SET last_confirmed_at = r.run_end
+        FROM history_runs r
+        WHERE h.id = r.id AND r.is_head
+    """)
+    op.execute("""
+        DELETE FROM reel_history h
+        USING history_runs r
+        WHERE h.id = r.id AND NOT r.is_head
+    """)
+
+
+def downgrade() -> None:
+    # Удалённые повторы не восстанавливаются: отрезок остаётся одной точкой
+    op.drop_column('reel_history', 'last_confirmed_at')
@@ -0,0 +1,31 @@
+"""parse_jobs indexes for fair-share claiming
+
+Revision ID: c47d0e91b5a8
+Revises: 8b2e4d6f1a23
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d0e91b5a8'
+down_revision: Union[str, None] = '8b2e4d6f1a23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_parse_jobs_user_status_created', 'parse_jobs',
+        ['user_id', 'status', 'created_at'],
+    )
+    op.create_index('ix_parse_jobs_started_at', 'parse_jobs', ['started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_parse_jobs_started_at', table_name='parse_jobs')
+    op.drop_index('ix_parse_jobs_user_status_created', table_name='parse_jobs')
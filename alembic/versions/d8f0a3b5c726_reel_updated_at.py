@@ -0,0 +1,32 @@
+"""reels.updated_at for incremental sync
+
+Revision ID: d8f0a3b5c726
+Revises: a2c4e6f8b013
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f0a3b5c726'
+down_revision: Union[str, None] = 'a2c4e6f8b013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'reels',
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text("(now() AT TIME ZONE 'utc')"), nullable=False),
+    )
+    op.alter_column('reels', 'updated_at', server_default=None)
+    op.create_index('ix_reels_user_updated', 'reels', ['user_id', 'updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reels_user_updated', table_name='reels')
+    op.drop_column('reels', 'updated_at')
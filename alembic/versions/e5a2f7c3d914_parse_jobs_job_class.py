@@ -0,0 +1,39 @@
+"""parse_jobs.job_class for the interactive express lane
+
+Revision ID: e5a2f7c3d914
+Revises: c47d0e91b5a8
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a2f7c3d914'
+down_revision: Union[str, None] = 'c47d0e91b5a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+jobclass = sa.Enum('INTERACTIVE', 'SCHEDULED', 'BACKFILL', name='jobclass')
+
+
+def upgrade() -> None:
+    jobclass.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        'parse_jobs',
+        sa.Column('job_class', jobclass, nullable=False, server_default='SCHEDULED'),
+    )
+    op.alter_column('parse_jobs', 'job_class', server_default=None)
+    op.create_index(
+        'ix_parse_jobs_status_class_created', 'parse_jobs',
+        ['status', 'job_class', 'created_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_parse_jobs_status_class_created', table_name='parse_jobs')
+    op.drop_column('parse_jobs', 'job_class')
+    jobclass.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,39 @@
+"""user_stats dashboard aggregates
+
+Revision ID: f1b3d5e7a940
+Revises: d8f0a3b5c726
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b3d5e7a940'
+down_revision: Union[str, None] = 'd8f0a3b5c726'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_reels', sa.Integer(), nullable=False),
+        sa.Column('total_views', sa.BigInteger(), nullable=False),
+        sa.Column('total_likes', sa.BigInteger(), nullable=False),
+        sa.Column('total_comments', sa.BigInteger(), nullable=False),
+        sa.Column('total_shares', sa.BigInteger(), nullable=False),
+        sa.Column('top_reels', sa.JSON(), nullable=False),
+        sa.Column('views_delta_24h', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('views_delta_7d', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    # Строки создаются при первом открытии дашборда (stats_service.get_user_stats)
+
+
+def downgrade() -> None:
+    op.drop_table('user_stats')
@@ -17,15 +17,17 @@ from app.services.auth_service import (
     create_refresh_token,
     decode_token,
 )
+from app.services.stats_service import get_user_stats
 
 router = APIRouter()
 
 
-def _make_tokens(user: User) -> Token:
+def _make_tokens(db: Session, user: User) -> Token:
     """Сгенерировать пару токенов для юзера"""
     access = create_access_token(data={"sub": str(user.id)})
     refresh = create_refresh_token(data={"sub": str(user.id)})
-    reels_count = len(user.reels) if user.reels else 0
+    # Счётчик из user_stats вместо загрузки всей коллекции рилсов
+    reels_count = get_user_stats(db, user).total_reels
     return Token(
         access_token=access,
         refresh_token=refresh,
@@ -52,7 +54,7 @@ def register(data: UserCreate, db: Session = Depends(get_db)):
         )
 
     user = create_user(db, data.email, data.password)
-    return _make_tokens(user)
+    return _make_tokens(db, user)
 
 
 @router.post("/login", response_model=Token)
@@ -66,7 +68,7 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
             detail="Неверный email или пароль",
         )
 
-    return _make_tokens(user)
+    return _make_tokens(db, user)
 
 
 @router.post("/refresh", response_model=Token)
@@ -88,13 +90,16 @@ def refresh_token(data: TokenRefresh, db: Session = Depends(get_db)):
             detail="Пользователь не найден или деактивирован",
         )
 
-    return _make_tokens(user)
+    return _make_tokens(db, user)
 
 
 @router.get("/me", response_model=UserResponse)
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """Получить профиль текущего юзера"""
-    reels_count = len(current_user.reels) if current_user.reels else 0
+    reels_count = get_user_stats(db, current_user).total_reels
     return UserResponse(
         id=current_user.id,
         email=current_user.email,
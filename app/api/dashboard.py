@@ -2,32 +2,31 @@
 API дашборда: агрегированная статистика
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
-from app.database import get_db
-from app.api.deps import get_current_user
+from app.database import get_async_db
+from app.api.deps import get_current_user_async, run_conditional
 from app.models.user import User
-from app.models.reel import Reel
+from app.services.stats_service import get_user_stats
 
 router = APIRouter()
 
 
 @router.get("")
-def get_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Агрегированная статистика по всем рилсам юзера"""
+    """Агрегированная статистика по всем рилсам юзера (одно чтение user_stats)"""
+    return await run_conditional(db, request, response, current_user, _dashboard, current_user)
 
-    stats = db.query(
-        func.count(Reel.id).label("total_reels"),
-        func.coalesce(func.sum(Reel.views), 0).label("total_views"),
-        func.coalesce(func.sum(Reel.likes), 0).label("total_likes"),
-        func.coalesce(func.sum(Reel.comments), 0).label("total_comments"),
-        func.coalesce(func.sum(Reel.shares), 0).label("total_shares"),
-    ).filter(Reel.user_id == current_user.id).first()
+
+def _dashboard(db: Session, current_user: User) -> dict:
+    stats = get_user_stats(db, current_user)
 
     # Средний ER
     total_interactions = stats.total_likes + stats.total_comments + stats.total_shares
@@ -35,10 +34,7 @@ def get_dashboard(
     if stats.total_views > 0:
         avg_er = round((total_interactions / stats.total_views) * 100, 2)
 
-    # Топ рилс по просмотрам
-    top_reel = db.query(Reel).filter(
-        Reel.user_id == current_user.id,
-    ).order_by(Reel.views.desc()).first()
+    top_reels = stats.top_reels or []
 
     return {
         "total_reels": stats.total_reels,
@@ -47,10 +43,9 @@ def get_dashboard(
         "total_comments": stats.total_comments,
         "total_shares": stats.total_shares,
         "avg_er": avg_er,
-        "top_reel": {
-            "id": top_reel.id,
-            "title": top_reel.title,
-            "views": top_reel.views,
-        } if top_reel else None,
+        "top_reel": top_reels[0] if top_reels else None,
+        "top_reels": top_reels,
+        "views_delta_24h": stats.views_delta_24h,
+        "views_delta_7d": stats.views_delta_7d,
         "tariff": current_user.tariff.value,
     }
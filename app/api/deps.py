@@ -2,15 +2,24 @@
 Зависимости для API endpoints:
 - get_db — сессия БД
 - get_current_user — текущий авторизованный юзер
+- get_current_user_from_query — то же по ?token= (EventSource не умеет заголовки)
+- get_current_user_async — то же для async-эндпоинтов (AsyncSession)
+- not_modified — условный GET по ETag из users.data_version
+- run_conditional — not_modified + чтение сервисом в одном проходе AsyncSession
 """
 
-from fastapi import Depends, HTTPException, status
+import zlib
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.services.auth_service import decode_token
+from app.services.principal_service import get_principal
 
 security = HTTPBearer()
 
@@ -20,7 +29,31 @@ def get_current_user(
     db: Session = Depends(get_db),
 ) -> User:
     """Извлечь текущего пользователя из JWT токена"""
-    token = credentials.credentials
+    return _user_from_token(credentials.credentials, db)
+
+
+def get_current_user_from_query(
+    token: str = Query(...),
+    db: Session = Depends(get_db),
+) -> User:
+    """Текущий пользователь по access token из query-параметра"""
+    return _user_from_token(token, db)
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """Текущий пользователь в AsyncSession запроса"""
+    user_id = _user_id_from_token(credentials.credentials)
+    return _active_user(await db.run_sync(get_principal, user_id))
+
+
+def _user_from_token(token: str, db: Session) -> User:
+    return _active_user(get_principal(db, _user_id_from_token(token)))
+
+
+def _user_id_from_token(token: str) -> int:
     payload = decode_token(token)
 
     if payload is None:
@@ -44,14 +77,15 @@ def get_current_user(
         )
 
     try:
-        user_id = int(user_id_str)
+        return int(user_id_str)
     except (ValueError, TypeError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Невалидный токен: неверный user id",
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+
+def _active_user(user: Optional[User]) -> User:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,3 +99,45 @@ def get_current_user(
         )
 
     return user
+
+
+def not_modified(request: Request, response: Response, user: User, salt: str = "") -> Optional[Response]:
+    """
+    Weak ETag ответа юзера: версия данных + путь с query (+ salt для
+    ответов, зависящих от времени). Совпал с If-None-Match — готовый 304,
+    иначе ETag ставится в response и возвращается None.
+    """
+    scope = f"{request.url.path}?{request.url.query}|{salt}"
+    etag = f'W/"{user.data_version}-{zlib.crc32(scope.encode()):08x}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+async def run_conditional(
+    db: AsyncSession,
+    request: Request,
+    response: Response,
+    user: User,
+    fn,
+    *args,
+    salt: str = "",
+):
+    """
+    Для async-эндпоинтов: проверка ETag и fn(session, *args) синхронного
+    сервиса одним run_sync (ленивые загрузки ORM возможны только внутри него).
+    """
+    def run(session: Session):
+        cached = not_modified(request, response, user, salt)
+        if cached:
+            return cached
+        return fn(session, *args)
+
+    return await db.run_sync(run)
@@ -0,0 +1,83 @@
+"""
+API push-событий: Server-Sent Events по юзеру
+"""
+
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.api.deps import get_current_user_from_query
+from app.models.user import User
+from app.schemas.reel import ReelSyncResponse
+from app.services.event_service import broker
+from app.services.reel_service import sync_user_reels
+
+router = APIRouter()
+
+# Комментарий-пинг, чтобы прокси не закрывали молчащее соединение
+KEEPALIVE_SECONDS = 20
+RECONNECT_MS = 5000
+
+
+def _sse(event: str, data: str, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    since: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: User = Depends(get_current_user_from_query),
+    db: Session = Depends(get_db),
+):
+    """
+    Поток событий юзера: metrics (новые метрики рилса), job (статус задачи),
+    resync (события потеряны — догнать через /reels/sync).
+
+    При переподключении с курсором (Last-Event-ID или since) первым
+    приходит событие sync — изменения с курсора в формате /reels/sync.
+    """
+    user_id = current_user.id
+    # Подписка до догоняющей выборки: событие между ними придёт дважды, но не потеряется
+    queue = broker.subscribe(user_id)
+
+    cursor = last_event_id or since
+    replay = None
+    if cursor:
+        try:
+            delta = await run_in_threadpool(sync_user_reels, db, current_user, cursor)
+        except Exception:
+            broker.unsubscribe(user_id, queue)
+            raise
+        replay = (ReelSyncResponse.model_validate(delta).model_dump_json(), delta["cursor"])
+
+    async def stream():
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            if replay is not None:
+                yield _sse("sync", *replay)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event["type"], json.dumps(event, ensure_ascii=False), event.get("at"))
+        finally:
+            broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,21 +3,27 @@ API парсинга: постановка в очередь, статус
 """
 
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.api.deps import get_current_user
+from app.database import get_db, get_async_db
+from app.api.deps import get_current_user, get_current_user_async, run_conditional
 from app.models.user import User
+from app.models.parsing import JobClass
 from app.services.reel_service import get_reel_by_id
 from app.services.parsing_service import (
-    create_parse_job,
-    create_parse_jobs_for_user,
+    enqueue_parse_jobs,
+    enqueue_user_reels,
     get_parse_status,
 )
 
 router = APIRouter()
 
+# Статус зависит и от времени (лаг, can_parse): ETag живёт не дольше этого окна
+STATUS_ETAG_SECONDS = 15
+
 
 @router.post("")
 def start_parsing(
@@ -40,25 +46,32 @@ def start_parsing(
 
     if reel_id:
         reel = get_reel_by_id(db, reel_id, current_user)
-        job = create_parse_job(db, current_user, reel)
+        result = enqueue_parse_jobs(db, current_user, [reel.id], JobClass.INTERACTIVE)
         return {
             "success": True,
-            "jobs_created": 1,
+            "jobs_created": result["created"],
+            "already_queued": result["already_queued"],
             "message": f"Рилс '{reel.title}' поставлен в очередь",
         }
     else:
-        jobs = create_parse_jobs_for_user(db, current_user)
+        result = enqueue_user_reels(db, current_user, JobClass.INTERACTIVE)
         return {
             "success": True,
-            "jobs_created": len(jobs),
-            "message": f"В очередь поставлено: {len(jobs)} рилсов",
+            "jobs_created": result["created"],
+            "already_queued": result["already_queued"],
+            "message": f"В очередь поставлено: {result['created']} рилсов",
         }
 
 
 @router.get("/status")
-def parsing_status(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+async def parsing_status(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Статус очереди парсинга для текущего юзера"""
-    return get_parse_status(db, current_user)
+    return await run_conditional(
+        db, request, response, current_user, get_parse_status, current_user,
+        salt=str(int(time.time() // STATUS_ETAG_SECONDS)),
+    )
@@ -2,34 +2,112 @@
 API для управления рилсами: CRUD
 """
 
-from typing import List
-from fastapi import APIRouter, Depends, status, Query
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile, status, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.api.deps import get_current_user
+from app.database import get_db, get_async_db
+from app.api.deps import get_current_user, get_current_user_async, run_conditional
 from app.models.user import User
-from app.schemas.reel import ReelCreate, ReelUpdate, ReelResponse, ReelHistoryResponse
+from app.models.parsing import JobClass
+from app.schemas.reel import (
+    ReelCreate,
+    ReelUpdate,
+    ReelResponse,
+    ReelPage,
+    ReelHistoryResponse,
+    ReelHistoryColumns,
+    ReelSyncResponse,
+    ReelImportRequest,
+    ReelImportReport,
+    ReelCompareResponse,
+)
 from app.services.reel_service import (
-    get_user_reels,
+    list_user_reels,
+    sync_user_reels,
     get_reel_by_id,
     create_reel,
     update_reel,
     delete_reel,
     get_reel_history,
+    compare_reels,
+)
+from app.services.history_service import history_columns
+from app.services.export_service import (
+    EXPORT_FORMATS,
+    resolve_export_reels,
+    check_export_format,
+    export_filename,
+    stream_history_export,
 )
-from app.services.parsing_service import create_parse_job
+from app.services.import_service import import_reels, parse_import_csv
+from app.services.parsing_service import enqueue_parse_jobs
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[ReelResponse])
-def list_reels(
+@router.get("", response_model=ReelPage, response_class=ORJSONResponse)
+async def list_reels(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("created_at", pattern="^(created_at|views|likes|comments|shares|views_velocity|engagement_rate|last_parsed_at|title)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    platform: Optional[str] = Query(None, pattern="^(instagram|tiktok|youtube|vk)$"),
+    enabled: Optional[bool] = None,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Страница рилсов текущего юзера: текущие метрики и спарклайн,
+    без истории. Следующая страница — по next_cursor.
+    Сортировка по любой метрике, скорости роста (views_velocity) или ER;
+    лидерборд — sort=engagement_rate&limit=10. Каждая сортировка идёт по своему индексу.
+    """
+    return await run_conditional(
+        db, request, response, current_user,
+        list_user_reels, current_user, limit, cursor, sort, order, platform, enabled,
+    )
+
+
+@router.get("/sync", response_model=ReelSyncResponse, response_class=ORJSONResponse)
+def sync_reels(
+    since: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Список всех рилсов текущего юзера"""
-    return get_user_reels(db, current_user)
+    """
+    Инкрементальная синхронизация: рилсы, изменившиеся после курсора since,
+    и их новые точки истории. Ответ содержит курсор для следующего запроса.
+    """
+    return sync_user_reels(db, current_user, since)
+
+
+@router.get("/export")
+def export_history(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet|arrow)$"),
+    reel_ids: Optional[List[int]] = Query(None, alias="reel_id"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Выгрузка сырой истории потоком: всех рилсов юзера или перечисленных
+    (?reel_id=1&reel_id=2), за диапазон from/to.
+    Форматы: csv, ndjson, parquet и arrow (поток Arrow IPC; оба — при установленном pyarrow).
+    """
+    check_export_format(export_format)
+    ids = resolve_export_reels(db, current_user, reel_ids)
+    return StreamingResponse(
+        stream_history_export(ids, start, end, export_format),
+        media_type=EXPORT_FORMATS[export_format][0],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(export_format)}"'},
+    )
 
 
 @router.post("", response_model=ReelResponse, status_code=status.HTTP_201_CREATED)
@@ -41,13 +119,58 @@ def add_reel(
     """Добавить новый рилс + поставить в очередь на парсинг"""
     reel = create_reel(db, current_user, data)
 
-    # Сразу ставим на парсинг
-    create_parse_job(db, current_user, reel)
+    # Сразу ставим на парсинг в экспресс-полосу
+    enqueue_parse_jobs(db, current_user, [reel.id], JobClass.INTERACTIVE)
 
     return reel
 
 
-@router.get("/{reel_id}", response_model=ReelResponse)
+@router.get("/compare", response_model=ReelCompareResponse, response_class=ORJSONResponse)
+def compare(
+    reel_ids: List[int] = Query(..., alias="reel_id"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    metrics: List[str] = Query(["views"], alias="metric"),
+    points: int = Query(200, ge=2, le=2000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Ряды нескольких рилсов одним запросом (?reel_id=1&reel_id=2&metric=views&metric=likes):
+    значения выровнены по общей сетке из points моментов в диапазоне from/to.
+    """
+    return compare_reels(db, current_user, reel_ids, start, end, metrics, points)
+
+
+def _import_and_enqueue(db: Session, user: User, items: List[dict]) -> dict:
+    report = import_reels(db, user, items)
+    created_ids = [r["reel_id"] for r in report["results"] if r["status"] == "created"]
+    # Первый парсинг — плановой полосой: тысячи рилсов не должны занять экспресс-полосу
+    report["queued"] = enqueue_parse_jobs(db, user, created_ids)["created"] if created_ids else 0
+    return report
+
+
+@router.post("/import", response_model=ReelImportReport)
+def import_reels_json(
+    data: ReelImportRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Массовое добавление рилсов списком {url, title?, platform?} — отчёт по каждой строке"""
+    return _import_and_enqueue(db, current_user, [item.model_dump() for item in data.items])
+
+
+@router.post("/import/csv", response_model=ReelImportReport)
+def import_reels_csv(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Массовое добавление из CSV: url[,title[,platform]], заголовок необязателен"""
+    return _import_and_enqueue(db, current_user, parse_import_csv(file.file.read()))
+
+
+@router.get("/{reel_id}", response_model=ReelResponse, response_class=ORJSONResponse)
 def get_reel(
     reel_id: int,
     current_user: User = Depends(get_current_user),
@@ -78,12 +201,31 @@ def remove_reel(
     delete_reel(db, reel_id, current_user)
 
 
-@router.get("/{reel_id}/history", response_model=List[ReelHistoryResponse])
-def reel_history(
+@router.get(
+    "/{reel_id}/history",
+    responses={200: {"model": Union[List[ReelHistoryResponse], ReelHistoryColumns]}},
+)
+async def reel_history(
     reel_id: int,
     limit: int = Query(50, ge=1, le=50000),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    max_points: Optional[int] = Query(None, ge=3, le=10000),
+    layout: str = Query("rows", alias="format", pattern="^(rows|columns)$"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """История метрик рилса"""
-    return get_reel_history(db, reel_id, current_user, limit)
+    """
+    История метрик рилса.
+    С from/to разрешение (сырые точки, часы, дни) выбирается по длине диапазона.
+    max_points — не больше стольких точек, прореживание с сохранением формы (LTTB).
+    format=columns — массивы по полям {t, confirmed, id, views, ...} вместо списка объектов.
+
+    Точки сервиса уже в форме ReelHistoryResponse (или ReelHistoryColumns
+    для format=columns), поэтому отдаются через orjson без поштучной
+    валидации pydantic; обе формы описаны в responses для OpenAPI.
+    """
+    points = await db.run_sync(get_reel_history, reel_id, current_user, limit, start, end, max_points)
+    if layout == "columns":
+        return ORJSONResponse(history_columns(points))
+    return ORJSONResponse(points)
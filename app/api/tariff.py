@@ -2,11 +2,11 @@
 API тарифных планов
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, not_modified
 from app.models.user import User
 from app.services.tariff_service import get_tariff_info, upgrade_to_pro
 
@@ -15,10 +15,15 @@ router = APIRouter()
 
 @router.get("")
 def get_tariff(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Текущий тариф + лимиты + использование"""
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
     return get_tariff_info(current_user, db)
 
 
@@ -20,6 +20,9 @@ from selenium.webdriver.chrome.options import Options
 
 logger = logging.getLogger(__name__)
 
+# Все метрики рилса; metrics['observed'] — какие из них реально получены
+METRIC_FIELDS = ('views', 'likes', 'comments', 'shares')
+
 
 class ReelsParser:
     def __init__(self, proxy=None, accounts_file=None):
@@ -225,8 +228,13 @@ class ReelsParser:
             logger.error(traceback.format_exc())
             self.driver = None
 
-    def parse_instagram(self, url):
-        """Парсинг Instagram Reels с авторизацией через куки"""
+    def parse_instagram(self, url, lite=False):
+        """
+        Парсинг Instagram Reels с авторизацией через куки.
+
+        lite=True — нужны только просмотры: HTTP-методы засчитываются
+        по views, oEmbed и DOM-поиск лайков пропускаются.
+        """
         try:
             logger.info(f"Парсинг Instagram: {url}")
             shortcode_match = re.search(r'/reel/([^/?]+)', url)
@@ -269,7 +277,8 @@ class ReelsParser:
                         metrics['likes'] = media.get('edge_media_preview_like', {}).get('count', 0)
                         metrics['comments'] = media.get('edge_media_to_comment', {}).get('count', 0) or media.get('edge_media_to_parent_comment', {}).get('count', 0)
                         logger.info(f"GraphQL web метрики: views={metrics['views']}, likes={metrics['likes']}")
-                        if metrics['views'] > 0 or metrics['likes'] > 0:
+                        if metrics['views'] > 0 or (metrics['likes'] > 0 and not lite):
+                            metrics['observed'] = ['views', 'likes', 'comments']
                             return metrics
                 else:
                     logger.debug(f"GraphQL web вернул {response.status_code}")
@@ -304,6 +313,7 @@ class ReelsParser:
                         metrics['shares'] = item.get('reshare_count', 0) or item.get('share_count', 0) or 0
                         logger.info(f"Mobile API метрики: views={metrics['views']}, likes={metrics['likes']}, shares={metrics['shares']}")
                         if metrics['views'] > 0:
+                            metrics['observed'] = list(METRIC_FIELDS)
                             return metrics
                 else:
                     logger.debug(f"Mobile API вернул {response.status_code}")
@@ -348,25 +358,27 @@ class ReelsParser:
                             metrics['comments'] = item.get('comment_count', 0)
                             metrics['shares'] = item.get('reshare_count', 0)
                             logger.info(f"API метрики: views={metrics['views']}, likes={metrics['likes']}")
-                            if metrics['views'] > 0 or metrics['likes'] > 0:
+                            if metrics['views'] > 0 or (metrics['likes'] > 0 and not lite):
+                                metrics['observed'] = list(METRIC_FIELDS)
                                 return metrics
                 except Exception as e:
                     logger.warning(f"API метод не сработал: {e}")
 
             # Метод 1.5: oEmbed API (публичный, возвращает базовые данные)
-            try:
-                oembed_url = f"https://www.instagram.com/api/v1/oembed/?url=https://www.instagram.com/reel/{shortcode}/"
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': 'application/json',
-                }
-                proxies = {'http': self.proxy, 'https': self.proxy} if self.proxy else None
-                response = requests.get(oembed_url, headers=headers, proxies=proxies, timeout=10)
-                if response.status_code == 200:
-                    # oEmbed не даёт метрик, но подтверждает что рилс существует
-                    logger.debug("oEmbed: рилс доступен")
-            except Exception as e:
-                logger.debug(f"oEmbed не сработал: {e}")
+            if not lite:
+                try:
+                    oembed_url = f"https://www.instagram.com/api/v1/oembed/?url=https://www.instagram.com/reel/{shortcode}/"
+                    headers = {
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                        'Accept': 'application/json',
+                    }
+                    proxies = {'http': self.proxy, 'https': self.proxy} if self.proxy else None
+                    response = requests.get(oembed_url, headers=headers, proxies=proxies, timeout=10)
+                    if response.status_code == 200:
+                        # oEmbed не даёт метрик, но подтверждает что рилс существует
+                        logger.debug("oEmbed: рилс доступен")
+                except Exception as e:
+                    logger.debug(f"oEmbed не сработал: {e}")
 
             # Метод 2: Selenium fallback
             if not self.driver:
@@ -440,7 +452,7 @@ class ReelsParser:
                     logger.debug(f"DOM поиск views не сработал: {e}")
 
             # Поиск лайков в DOM если не нашли в JSON
-            if metrics['likes'] == 0:
+            if metrics['likes'] == 0 and not lite:
                 try:
                     like_selectors = [
                         'section span[class*="like"]',
@@ -486,8 +498,10 @@ class ReelsParser:
                 except Exception as e:
                     logger.debug(f"Расширенный поиск views не сработал: {e}")
 
-            if metrics['views'] > 0 or metrics['likes'] > 0:
+            if metrics['views'] > 0 or (metrics['likes'] > 0 and not lite):
                 logger.info(f"Instagram метрики: views={metrics['views']}, likes={metrics['likes']}, comments={metrics['comments']}, shares={metrics['shares']}")
+                # Из страницы считаем наблюдёнными только найденные значения
+                metrics['observed'] = [name for name in METRIC_FIELDS if metrics[name] > 0]
                 return metrics
             else:
                 logger.warning("Instagram: не удалось получить метрики")
@@ -497,8 +511,8 @@ class ReelsParser:
             logger.error(f"Ошибка парсинга Instagram: {e}")
             return None
 
-    def parse_tiktok(self, url):
-        """Парсинг TikTok"""
+    def parse_tiktok(self, url, lite=False):
+        """Парсинг TikTok (lite не дешевле загрузки страницы — метрики читаются все)"""
         try:
             logger.info(f"Парсинг TikTok: {url}")
             if not self.driver:
@@ -510,6 +524,7 @@ class ReelsParser:
                 'likes': self._extract_tiktok_metric('like'),
                 'comments': self._extract_tiktok_metric('comment'),
                 'shares': self._extract_tiktok_metric('share'),
+                'observed': list(METRIC_FIELDS),
                 'timestamp': datetime.now().isoformat()
             }
             logger.info(f"TikTok метрики: {metrics}")
@@ -537,8 +552,8 @@ class ReelsParser:
         except:
             return 0
 
-    def parse_youtube_shorts(self, url):
-        """Парсинг YouTube Shorts"""
+    def parse_youtube_shorts(self, url, lite=False):
+        """Парсинг YouTube Shorts (lite не дешевле загрузки страницы — метрики читаются все)"""
         try:
             logger.info(f"Парсинг YouTube Shorts: {url}")
             if not self.driver:
@@ -550,6 +565,7 @@ class ReelsParser:
                 'likes': self._extract_youtube_likes(),
                 'comments': self._extract_youtube_comments(),
                 'shares': 0,
+                'observed': ['views', 'likes', 'comments'],
                 'timestamp': datetime.now().isoformat()
             }
             logger.info(f"YouTube метрики: {metrics}")
@@ -587,8 +603,8 @@ class ReelsParser:
         except:
             return 0
 
-    def parse_vk(self, url):
-        """Парсинг VK Клипов"""
+    def parse_vk(self, url, lite=False):
+        """Парсинг VK Клипов (lite не дешевле загрузки страницы — метрики читаются все)"""
         try:
             logger.info(f"Парсинг VK: {url}")
             if not self.driver:
@@ -600,6 +616,7 @@ class ReelsParser:
                 'likes': self._extract_vk_metric('likes'),
                 'comments': self._extract_vk_metric('comments'),
                 'shares': self._extract_vk_metric('shares'),
+                'observed': list(METRIC_FIELDS),
                 'timestamp': datetime.now().isoformat()
             }
             logger.info(f"VK метрики: {metrics}")
@@ -639,17 +656,24 @@ class ReelsParser:
         except:
             return 0
 
-    def parse_reel(self, url, platform):
-        """Универсальный метод парсинга"""
+    def parse_reel(self, url, platform, lite=False):
+        """
+        Универсальный метод парсинга.
+
+        lite=True — дешёвый путь, которому достаточно просмотров;
+        остальные метрики не гарантированы (см. metrics['observed']).
+        Дешевле только Instagram (HTTP-методы без браузера); TikTok, YouTube
+        и VK всё равно грузят страницу в Selenium и отдают все её метрики.
+        """
         platform = platform.lower()
         if platform == 'instagram':
-            return self.parse_instagram(url)
+            return self.parse_instagram(url, lite)
         elif platform == 'tiktok':
-            return self.parse_tiktok(url)
+            return self.parse_tiktok(url, lite)
         elif platform == 'youtube':
-            return self.parse_youtube_shorts(url)
+            return self.parse_youtube_shorts(url, lite)
         elif platform == 'vk':
-            return self.parse_vk(url)
+            return self.parse_vk(url, lite)
         else:
             logger.error(f"Неизвестная платформа: {platform}")
             return None
@@ -3,6 +3,8 @@
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import get_settings
 
@@ -10,14 +12,29 @@ settings = get_settings()
 
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     pool_pre_ping=True,
     echo=settings.DEBUG,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async-путь (asyncpg) для читающих эндпоинтов: ожидание Postgres не занимает
+# поток threadpool. Та же БД, драйвер подставляется в DATABASE_URL.
+# Пул отдельный от sync-движка — бюджет соединений см. DB_POOL_SIZE в config.
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    echo=settings.DEBUG,
+)
+
+# expire_on_commit=False: ответ сериализуется после выхода из run_sync,
+# где ленивая дозагрузка атрибутов уже невозможна
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -30,3 +47,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency для async-эндпоинтов: AsyncSession поверх asyncpg"""
+    async with AsyncSessionLocal() as db:
+        yield db
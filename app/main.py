@@ -10,6 +10,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
 from app.config import get_settings
+from app.core.compression import CompressionMiddleware
 from app.database import engine, Base
 
 # Настройка логгирования
@@ -24,34 +25,36 @@ settings = get_settings()
 
 
 def reset_stuck_jobs():
-    """Сброс зависших задач (RUNNING без завершения)"""
+    """Сброс зависших задач (RUNNING с истёкшей арендой)"""
     from app.database import SessionLocal
-    from app.models.parsing import ParseJob, JobStatus
-    from datetime import datetime, timedelta
+    from app.services.parsing_service import requeue_expired_jobs
 
     db = SessionLocal()
     try:
-        # Задачи в статусе RUNNING более 10 минут — считаем зависшими
-        cutoff = datetime.utcnow() - timedelta(minutes=10)
-        stuck_jobs = db.query(ParseJob).filter(
-            ParseJob.status == JobStatus.RUNNING,
-            ParseJob.started_at < cutoff
-        ).all()
-
-        for job in stuck_jobs:
-            job.status = JobStatus.PENDING
-            job.started_at = None
-            logger.warning(f"🔄 Сброшена зависшая задача #{job.id}")
-
-        if stuck_jobs:
-            db.commit()
-            logger.info(f"✅ Сброшено {len(stuck_jobs)} зависших задач")
+        count = requeue_expired_jobs(db)
+        if count:
+            logger.info(f"✅ Сброшено {count} зависших задач")
     except Exception as e:
         logger.error(f"Ошибка сброса задач: {e}")
     finally:
         db.close()
 
 
+def ensure_history_partitions_on_startup():
+    """Секции reel_history на текущий и ближайшие месяцы (свежая БД создаётся секционированной)"""
+    from app.database import SessionLocal
+    from app.services.history_service import ensure_history_partitions
+    from datetime import datetime
+
+    db = SessionLocal()
+    try:
+        ensure_history_partitions(db, datetime.utcnow())
+    except Exception as e:
+        logger.error(f"Ошибка создания секций истории: {e}")
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup / shutdown events"""
@@ -60,18 +63,26 @@ async def lifespan(app: FastAPI):
     # Создаём таблицы (в продакшене — alembic migrate)
     Base.metadata.create_all(bind=engine)
     logger.info("✅ Таблицы БД готовы")
+    ensure_history_partitions_on_startup()
 
     # Сброс зависших задач от предыдущего запуска
     reset_stuck_jobs()
 
     # Запуск фонового парсера и шедулера
-    from app.workers.scheduler import start_scheduler_thread, start_worker_thread
+    from app.workers.scheduler import start_scheduler_thread, start_worker_thread, start_history_thread
     start_scheduler_thread(check_interval=30)
     start_worker_thread(poll_interval=5)
-    logger.info("✅ Scheduler + Worker запущены")
+    start_history_thread(check_interval=300)
+    logger.info("✅ Scheduler + Worker + History maintenance запущены")
+
+    # Push-события (NOTIFY → SSE)
+    from app.services.event_service import start_event_broker
+    start_event_broker()
 
     yield
 
+    from app.database import async_engine
+    await async_engine.dispose()
     logger.info("👋 ReelsTracker SaaS остановлен")
 
 
@@ -91,6 +102,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие больших ответов (история, списки) — br/gzip по Accept-Encoding
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # ─── API Routes ────────────────────────────────────────────
 
 from app.api.auth import router as auth_router
@@ -99,6 +113,7 @@ from app.api.dashboard import router as dashboard_router
 from app.api.telegram import router as telegram_router
 from app.api.tariff import router as tariff_router
 from app.api.parsing import router as parsing_router
+from app.api.events import router as events_router
 
 app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
 app.include_router(reels_router, prefix="/api/reels", tags=["Reels"])
@@ -106,6 +121,7 @@ app.include_router(dashboard_router, prefix="/api/dashboard", tags=["Dashboard"]
 app.include_router(telegram_router, prefix="/api/settings/telegram", tags=["Telegram"])
 app.include_router(tariff_router, prefix="/api/tariff", tags=["Tariff"])
 app.include_router(parsing_router, prefix="/api/parse", tags=["Parsing"])
+app.include_router(events_router, prefix="/api/events", tags=["Events"])
 
 # ─── Static Files ──────────────────────────────────────────
 
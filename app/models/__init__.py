@@ -1,5 +1,10 @@
 from app.models.user import User
 from app.models.reel import Reel, ReelHistory
 from app.models.parsing import ParseJob
+from app.models.history import ReelHistoryHourly, ReelHistoryDaily, ReelHistoryPacked, RollupState
+from app.models.stats import UserStats
 
-__all__ = ["User", "Reel", "ReelHistory", "ParseJob"]
+__all__ = [
+    "User", "Reel", "ReelHistory", "ParseJob",
+    "ReelHistoryHourly", "ReelHistoryDaily", "ReelHistoryPacked", "RollupState", "UserStats",
+]
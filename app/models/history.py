@@ -0,0 +1,92 @@
+"""
+Модели агрегатов истории метрик (rollups): часовые и дневные корзины
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import declared_attr
+from app.database import Base
+
+
+class RollupMixin:
+    """
+    Корзина метрик рилса: min / max / последнее значение за период.
+    Первичный ключ (reel_id, bucket_start) — он же индекс для выборки по диапазону.
+    Порядок колонок ключа задан явно: по флагам primary_key create_all
+    поставил бы bucket_start первым (declared_attr-колонки идут после обычных).
+    """
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (PrimaryKeyConstraint("reel_id", "bucket_start"),)
+
+    @declared_attr
+    def reel_id(cls):
+        return Column(Integer, ForeignKey("reels.id", ondelete="CASCADE"), nullable=False)
+
+    bucket_start = Column(DateTime, nullable=False)
+
+    views_min = Column(Integer, nullable=False)
+    views_max = Column(Integer, nullable=False)
+    views_last = Column(Integer, nullable=False)
+    likes_min = Column(Integer, nullable=False)
+    likes_max = Column(Integer, nullable=False)
+    likes_last = Column(Integer, nullable=False)
+    comments_min = Column(Integer, nullable=False)
+    comments_max = Column(Integer, nullable=False)
+    comments_last = Column(Integer, nullable=False)
+    shares_min = Column(Integer, nullable=False)
+    shares_max = Column(Integer, nullable=False)
+    shares_last = Column(Integer, nullable=False)
+
+    # Время последней точки, попавшей в корзину (для корректного last при слиянии)
+    last_at = Column(DateTime, nullable=False)
+
+
+class ReelHistoryHourly(RollupMixin, Base):
+    __tablename__ = "reel_history_hourly"
+
+    def __repr__(self):
+        return f"<ReelHistoryHourly reel={self.reel_id} at {self.bucket_start}>"
+
+
+class ReelHistoryDaily(RollupMixin, Base):
+    __tablename__ = "reel_history_daily"
+
+    def __repr__(self):
+        return f"<ReelHistoryDaily reel={self.reel_id} at {self.bucket_start}>"
+
+
+class ReelHistoryPacked(Base):
+    """
+    Компактное хранение закрытых дней сырой истории: одна строка на
+    (рилс, день) с параллельными массивами вместо строки на точку.
+    Смещения — секунды от начала дня (confirmed может выходить за сутки).
+    """
+    __tablename__ = "reel_history_packed"
+
+    reel_id = Column(Integer, ForeignKey("reels.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(DateTime, primary_key=True)
+
+    offsets = Column(ARRAY(Integer), nullable=False)    # parsed_at
+    confirmed = Column(ARRAY(Integer), nullable=False)  # last_confirmed_at
+    views = Column(ARRAY(Integer), nullable=False)
+    likes = Column(ARRAY(Integer), nullable=False)
+    comments = Column(ARRAY(Integer), nullable=False)
+    shares = Column(ARRAY(Integer), nullable=False)
+    observed = Column(ARRAY(Integer), nullable=False)
+
+    def __repr__(self):
+        return f"<ReelHistoryPacked reel={self.reel_id} day={self.day} points={len(self.offsets or [])}>"
+
+
+class RollupState(Base):
+    """Водяные знаки инкрементальной агрегации: до какого момента всё свёрнуто"""
+    __tablename__ = "rollup_state"
+
+    name = Column(String(50), primary_key=True)  # hourly, daily
+    watermark = Column(DateTime, nullable=False, default=datetime(1970, 1, 1))
+
+    def __repr__(self):
+        return f"<RollupState {self.name} до {self.watermark}>"
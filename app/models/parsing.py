@@ -4,7 +4,7 @@
 
 import enum
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -16,6 +16,31 @@ class JobStatus(str, enum.Enum):
     FAILED = "failed"
 
 
+class JobClass(str, enum.Enum):
+    """Класс задачи: определяет полосу очереди"""
+    INTERACTIVE = "interactive"  # юзер ждёт результат в UI
+    SCHEDULED = "scheduled"      # плановое обновление шедулером
+    BACKFILL = "backfill"        # фоновая дозагрузка, только на свободные воркеры
+
+
+class JobType(str, enum.Enum):
+    """Объём парсинга"""
+    FULL = "full"  # все метрики
+    LITE = "lite"  # только просмотры, самым дешёвым способом
+
+
+# Порядок полос при взятии задачи воркером
+JOB_CLASS_ORDER = (JobClass.INTERACTIVE, JobClass.SCHEDULED, JobClass.BACKFILL)
+
+
+# Задача в работе: на один рилс может быть не больше одной такой.
+# SQLAlchemy хранит Enum по имени, поэтому в предикате — имена членов.
+ACTIVE_JOB_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING)
+ACTIVE_JOB_WHERE = text(
+    "status IN (" + ", ".join(f"'{s.name}'" for s in ACTIVE_JOB_STATUSES) + ")"
+)
+
+
 class ParseJob(Base):
     __tablename__ = "parse_jobs"
 
@@ -25,9 +50,13 @@ class ParseJob(Base):
 
     status = Column(Enum(JobStatus), default=JobStatus.PENDING, nullable=False, index=True)
     priority = Column(Integer, default=0)  # Pro=10, Free=0
+    job_class = Column(Enum(JobClass), default=JobClass.SCHEDULED, nullable=False)
+    job_type = Column(Enum(JobType), default=JobType.FULL, nullable=False)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     started_at = Column(DateTime, nullable=True)
+    # Продление аренды: результат ждёт записи в буфере result writer'а
+    heartbeat_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
 
     error_message = Column(Text, nullable=True)
@@ -44,6 +73,11 @@ class ParseJob(Base):
 
     __table_args__ = (
         Index("ix_parse_jobs_status_priority", "status", "priority"),
+        # Fair-share очередь: головная задача юзера и обслуженные за окно
+        Index("ix_parse_jobs_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_parse_jobs_status_class_created", "status", "job_class", "created_at"),
+        Index("ix_parse_jobs_started_at", "started_at"),
+        Index("uq_parse_jobs_active_reel", "reel_id", unique=True, postgresql_where=ACTIVE_JOB_WHERE),
     )
 
     def __repr__(self):
@@ -3,10 +3,37 @@
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, UniqueConstraint, Index
+from sqlalchemy import (
+    Column, Integer, String, Boolean, DateTime, Float, ForeignKey, UniqueConstraint, Index, Computed, text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+# Биты reel_history.observed: какие метрики точки реально получены парсером,
+# остальные перенесены из предыдущего значения
+METRIC_BITS = {"views": 1, "likes": 2, "comments": 4, "shares": 8}
+ALL_METRICS_OBSERVED = sum(METRIC_BITS.values())
+
+
+def observed_mask(fields) -> int:
+    """Битовая маска по списку названий метрик"""
+    return sum(METRIC_BITS[name] for name in set(fields) if name in METRIC_BITS)
+
+
+# Ключ сортировки списка рилсов → индексируемое выражение
+REEL_SORT_INDEXES = {
+    "created_at": "created_at",
+    "views": "coalesce(views, 0)",
+    "likes": "coalesce(likes, 0)",
+    "comments": "coalesce(comments, 0)",
+    "shares": "coalesce(shares, 0)",
+    "views_velocity": "views_velocity",
+    "engagement_rate": "coalesce(engagement_rate, 0)",
+    "last_parsed_at": "coalesce(last_parsed_at, '1970-01-01 00:00:00'::timestamp)",
+    "title": "title",
+}
+
 
 class Reel(Base):
     __tablename__ = "reels"
@@ -25,7 +52,23 @@ class Reel(Base):
     shares = Column(Integer, default=0)
 
     last_parsed_at = Column(DateTime, nullable=True)
+    # Когда рилс в следующий раз должен попасть в очередь (по интервалу тарифа)
+    next_parse_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Когда следующий парсинг должен быть полным (иначе lite — только просмотры)
+    next_full_parse_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Скорость роста просмотров (EWMA, просмотров/час) и адаптивный интервал
+    views_velocity = Column(Float, default=0.0, nullable=False)
+    # ER: (лайки + комментарии + репосты) / просмотры; считает Postgres при записи метрик
+    engagement_rate = Column(
+        Float,
+        Computed("(coalesce(likes, 0) + coalesce(comments, 0) + coalesce(shares, 0))::float8 / nullif(views, 0)"),
+    )
+    parse_interval_minutes = Column(Float, nullable=True)  # None — интервал тарифа
+    # Просмотры по последним часовым корзинам (для списка без истории), обновляет rollup
+    sparkline = Column(ARRAY(Integer), default=list, server_default="{}", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Последнее изменение видимых клиенту данных (метрики, спарклайн, настройки) — курсор /reels/sync
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="reels")
@@ -36,6 +79,15 @@ class Reel(Base):
     # Один URL на юзера
     __table_args__ = (
         UniqueConstraint("user_id", "url", name="uq_user_url"),
+        # Шедулер выбирает созревшие рилсы диапазоном по next_parse_at
+        Index("ix_reels_next_parse_at", "next_parse_at", postgresql_where=text("enabled")),
+        Index("ix_reels_user_updated", "user_id", "updated_at"),
+        # Сортировки списка (keyset по (выражение, id) внутри юзера); выражения — как в
+        # reel_service.REEL_SORTS, фильтры platform/enabled берутся из индекса
+        *[
+            Index(f"ix_reels_user_sort_{name}", "user_id", text(expr), "id", postgresql_include=["platform", "enabled"])
+            for name, expr in REEL_SORT_INDEXES.items()
+        ],
     )
 
     def __repr__(self):
@@ -43,23 +95,38 @@ class Reel(Base):
 
 
 class ReelHistory(Base):
+    """
+    Точка истории метрик. Таблица секционирована по месяцам parsed_at
+    (RANGE), поэтому parsed_at входит в первичный ключ; секции создаёт
+    и удаляет history_service.
+    """
     __tablename__ = "reel_history"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     reel_id = Column(Integer, ForeignKey("reels.id", ondelete="CASCADE"), nullable=False)
 
     views = Column(Integer, default=0)
     likes = Column(Integer, default=0)
     comments = Column(Integer, default=0)
     shares = Column(Integer, default=0)
+    observed = Column(Integer, default=ALL_METRICS_OBSERVED, nullable=False)
 
-    parsed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Точка хранит отрезок [parsed_at, last_confirmed_at]: повторные парсинги
+    # с теми же метриками не создают строк, а сдвигают last_confirmed_at
+    parsed_at = Column(DateTime, default=datetime.utcnow, nullable=False, primary_key=True)
+    last_confirmed_at = Column(DateTime, nullable=True)  # None — как parsed_at
+    # Отрезок, перенесённый из удалённой секции в начало следующего месяца:
+    # исходный parsed_at (None — точка не переносилась)
+    carried_from = Column(DateTime, nullable=True)
 
     # Relationships
     reel = relationship("Reel", back_populates="history")
 
     __table_args__ = (
         Index("ix_reel_history_reel_parsed", "reel_id", "parsed_at"),
+        # BRIN: данные пишутся по возрастанию времени, индекс на диапазоны крошечный
+        Index("ix_reel_history_parsed_brin", "parsed_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (parsed_at)"},
     )
 
     def __repr__(self):
@@ -0,0 +1,36 @@
+"""
+Модель агрегатов дашборда юзера
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey, JSON
+from app.database import Base
+
+
+class UserStats(Base):
+    """
+    Агрегаты дашборда: поддерживаются инкрементально при записи метрик
+    (stats_service), чтобы GET /api/dashboard был одним чтением по ключу.
+    Суммы — BigInteger: просмотры сотен рилсов не помещаются в int4.
+    """
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    total_reels = Column(Integer, default=0, nullable=False)
+    total_views = Column(BigInteger, default=0, nullable=False)
+    total_likes = Column(BigInteger, default=0, nullable=False)
+    total_comments = Column(BigInteger, default=0, nullable=False)
+    total_shares = Column(BigInteger, default=0, nullable=False)
+
+    # [{id, title, views}] по убыванию просмотров
+    top_reels = Column(JSON, default=list, nullable=False)
+
+    # Прирост просмотров за 24 часа и 7 дней (по rollups, пересчитывается history-тиком)
+    views_delta_24h = Column(BigInteger, default=0, nullable=False)
+    views_delta_7d = Column(BigInteger, default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserStats user={self.user_id} reels={self.total_reels} views={self.total_views}>"
@@ -24,6 +24,12 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Во сколько раз растянуть адаптивные интервалы, чтобы уложиться в бюджет тарифа
+    parse_budget_factor = Column(Float, default=1.0, nullable=False)
+
+    # Растёт при каждом изменении данных юзера — основа ETag (version_service)
+    data_version = Column(Integer, default=0, nullable=False)
+
     # Telegram settings (per-user)
     telegram_enabled = Column(Boolean, default=False)
     telegram_bot_token = Column(String(255), nullable=True)
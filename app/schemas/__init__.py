@@ -1,9 +1,13 @@
 from app.schemas.user import UserCreate, UserLogin, UserResponse, Token, TokenRefresh
-from app.schemas.reel import ReelCreate, ReelUpdate, ReelResponse, ReelHistoryResponse
+from app.schemas.reel import (
+    ReelCreate, ReelUpdate, ReelResponse, ReelPage, ReelHistoryResponse, ReelHistoryColumns,
+    ReelSyncResponse, ReelImportRequest, ReelImportReport, ReelCompareResponse,
+)
 from app.schemas.telegram import TelegramSettings, TelegramSettingsUpdate
 
 __all__ = [
     "UserCreate", "UserLogin", "UserResponse", "Token", "TokenRefresh",
-    "ReelCreate", "ReelUpdate", "ReelResponse", "ReelHistoryResponse",
+    "ReelCreate", "ReelUpdate", "ReelResponse", "ReelPage", "ReelHistoryResponse", "ReelHistoryColumns",
+    "ReelSyncResponse", "ReelImportRequest", "ReelImportReport", "ReelCompareResponse",
     "TelegramSettings", "TelegramSettingsUpdate",
 ]
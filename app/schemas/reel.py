@@ -4,7 +4,7 @@ Pydantic схемы для рилсов
 
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class ReelCreate(BaseModel):
@@ -18,17 +18,68 @@ class ReelUpdate(BaseModel):
     enabled: Optional[bool] = None
 
 
+class ReelImportItem(BaseModel):
+    url: str = Field(max_length=2048)  # проверяется построчно, ошибка — в отчёте
+    title: Optional[str] = None  # по умолчанию — платформа и id ролика
+    platform: Optional[str] = None  # по умолчанию — по домену
+
+
+class ReelImportRequest(BaseModel):
+    items: List[ReelImportItem] = Field(min_length=1, max_length=10000)
+
+
+class ReelImportRowResult(BaseModel):
+    row: int  # номер строки во входных данных, с 1
+    url: str
+    status: str  # created, exists, duplicate, invalid, limit
+    reel_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class ReelImportReport(BaseModel):
+    created: int
+    skipped: int
+    queued: int  # поставлено на первый парсинг
+    results: List[ReelImportRowResult]
+
+
 class ReelHistoryResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None — точка из часовой/дневной корзины
     views: int
     likes: int
     comments: int
     shares: int
+    observed: int = 15  # биты views=1, likes=2, comments=4, shares=8
     parsed_at: datetime
+    last_confirmed_at: Optional[datetime] = None  # значения не менялись до этого момента
 
     model_config = {"from_attributes": True}
 
 
+class ReelHistoryColumns(BaseModel):
+    """История в колоночном виде (format=columns): i-й элемент каждого массива — i-я точка"""
+    t: List[datetime]  # parsed_at
+    confirmed: List[Optional[datetime]]  # last_confirmed_at
+    id: List[Optional[int]]
+    views: List[int]
+    likes: List[int]
+    comments: List[int]
+    shares: List[int]
+    observed: List[int]
+
+
+class ReelCompareSeries(BaseModel):
+    reel_id: int
+    title: str
+    values: Dict[str, List[Optional[int]]]  # метрика → значения в моменты t (None — ещё нет данных)
+
+
+class ReelCompareResponse(BaseModel):
+    resolution: str  # raw, hourly или daily — из чего построены ряды
+    t: List[datetime]  # общая сетка моментов
+    series: List[ReelCompareSeries]
+
+
 class ReelResponse(BaseModel):
     id: int
     title: str
@@ -39,8 +90,28 @@ class ReelResponse(BaseModel):
     likes: int
     comments: int
     shares: int
+    views_velocity: float = 0.0  # просмотров в час (сглаженная)
+    engagement_rate: Optional[float] = None  # (лайки + комментарии + репосты) / просмотры
     last_parsed_at: Optional[datetime] = None
     created_at: datetime
-    history: List[ReelHistoryResponse] = []
+    # Просмотры по последним часам; полная история — /reels/{id}/history
+    sparkline: List[int] = []
 
     model_config = {"from_attributes": True}
+
+
+class ReelPage(BaseModel):
+    items: List[ReelResponse]
+    next_cursor: Optional[str] = None  # None — последняя страница
+
+
+class ReelHistoryDelta(BaseModel):
+    reel_id: int
+    points: List[ReelHistoryResponse]
+
+
+class ReelSyncResponse(BaseModel):
+    reels: List[ReelResponse]
+    history: List[ReelHistoryDelta] = []
+    cursor: str  # передать как since в следующий запрос
+    reel_count: int
@@ -0,0 +1,140 @@
+"""
+Сервис push-событий: Postgres NOTIFY → подписчики SSE по юзерам
+
+Result writer и очередь публикуют события (метрики рилса, статус задачи)
+через pg_notify в транзакции записи — событие уходит только после commit.
+В каждом API-процессе EventBroker слушает канал одним соединением и
+раздаёт события в очереди подписок юзера.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "reel_events"
+
+# Очередь подписки: при переполнении (медленный клиент) события
+# отбрасываются и клиенту уходит resync — он догоняет через /reels/sync
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+LISTEN_POLL_SECONDS = 5
+RECONNECT_DELAY_SECONDS = 5
+
+
+def notify_events(db: Session, events: List[dict]) -> None:
+    """Опубликовать события одним запросом; доставляются после commit транзакции db"""
+    if not events:
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+        {
+            "channel": EVENTS_CHANNEL,
+            "payloads": [json.dumps(event, default=str, separators=(",", ":")) for event in events],
+        },
+    )
+
+
+class EventBroker:
+    """LISTEN на EVENTS_CHANNEL в фоновом потоке и раздача событий подписчикам"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        # Служебные события процесса (type → обработчик), подписчикам не уходят
+        self._listeners: Dict[str, Callable[[dict], None]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """Очередь событий юзера (вызывать из event loop)"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers = {s for s in subscribers if s[1] is not queue}
+            if subscribers:
+                self._subscribers[user_id] = subscribers
+            else:
+                self._subscribers.pop(user_id, None)
+
+    def add_listener(self, event_type: str, callback: Callable[[dict], None]):
+        """Обработчик служебных событий event_type (вызывается в потоке брокера)"""
+        self._listeners[event_type] = callback
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="event-broker")
+            self._thread.start()
+            logger.info(f"📡 Event broker слушает канал {EVENTS_CHANNEL}")
+        return self._thread
+
+    def _dispatch(self, event: dict):
+        listener = self._listeners.get(event.get("type"))
+        if listener is not None:
+            listener(event)
+            return
+
+        with self._lock:
+            targets = list(self._subscribers.get(event.get("user_id"), ()))
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(_offer, queue, event)
+
+    def _run(self):
+        while True:
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {EVENTS_CHANNEL}")
+
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self._dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning(f"Некорректное событие: {notify.payload[:200]}")
+            except Exception as e:
+                logger.error(f"Event broker error: {e}")
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+                time.sleep(RECONNECT_DELAY_SECONDS)
+
+
+def _offer(queue: asyncio.Queue, event: dict):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync"})
+
+
+broker = EventBroker()
+
+
+def start_event_broker():
+    return broker.start()
@@ -0,0 +1,181 @@
+"""
+Сервис выгрузки истории метрик: CSV, NDJSON, Parquet, Arrow IPC
+
+Ответ отдаётся генератором (StreamingResponse): точки читаются пачками
+серверного курсора и сразу кодируются, в памяти держится не больше
+одной пачки (для колоночных форматов — одной группы строк).
+"""
+
+import csv
+import io
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.reel import Reel
+from app.services.history_service import iter_history_export, EXPORT_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # колоночные форматы доступны только с pyarrow
+    pa = pq = None
+
+# Формат → (media type, расширение файла)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR_FORMATS = {"parquet", "arrow"}
+
+# Текстовые форматы отдаются кусками примерно такого размера
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Строк в группе Parquet / батче Arrow
+EXPORT_ROW_GROUP = 50000
+
+
+def resolve_export_reels(db: Session, user: User, reel_ids: Optional[List[int]]) -> List[int]:
+    """ID рилсов юзера для выгрузки: все или перечисленные (чужие и несуществующие — 404)"""
+    query = db.query(Reel.id).filter(Reel.user_id == user.id)
+    if reel_ids:
+        query = query.filter(Reel.id.in_(set(reel_ids)))
+    ids = [reel_id for reel_id, in query.order_by(Reel.id.asc())]
+
+    if reel_ids and len(ids) != len(set(reel_ids)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рилс не найден",
+        )
+    return ids
+
+
+def check_export_format(export_format: str) -> None:
+    """Ошибка 400 до начала потока, если формат недоступен на сервере"""
+    if export_format in COLUMNAR_FORMATS and pa is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Формат {export_format} недоступен: на сервере не установлен pyarrow",
+        )
+
+
+def export_filename(export_format: str) -> str:
+    return f"reels_history_{datetime.utcnow():%Y%m%d_%H%M}.{EXPORT_FORMATS[export_format][1]}"
+
+
+def stream_history_export(
+    reel_ids: List[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    export_format: str,
+) -> Iterator[bytes]:
+    """
+    Байты выгрузки. Своя сессия: генератор дочитывается уже после того,
+    как сессия запроса закрыта.
+    """
+    db = SessionLocal()
+    try:
+        batches = iter_history_export(db, reel_ids, start, end)
+        yield from _ENCODERS[export_format](batches)
+    finally:
+        db.close()
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_csv(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        writer.writerows([_iso(value) for value in row] for row in batch)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(orjson.dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файл только на запись: написанное забирает drain(), tell() — всего записано"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        chunk, self._chunks = b"".join(self._chunks), []
+        return chunk
+
+
+def _arrow_schema():
+    return pa.schema(
+        [("reel_id", pa.int32()), ("parsed_at", pa.timestamp("us")), ("last_confirmed_at", pa.timestamp("us"))]
+        + [(name, pa.int64()) for name in EXPORT_FIELDS[3:]]
+    )
+
+
+def _row_groups(batches: Iterable[List[tuple]]) -> Iterator[List[tuple]]:
+    """Склеить пачки курсора в группы по EXPORT_ROW_GROUP строк"""
+    group = []
+    for batch in batches:
+        group.extend(batch)
+        if len(group) >= EXPORT_ROW_GROUP:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def _encode_columnar(batches: Iterable[List[tuple]], export_format: str) -> Iterator[bytes]:
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_table
+        to_arrow = pa.Table.from_arrays
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+        to_arrow = pa.RecordBatch.from_arrays
+
+    for group in _row_groups(batches):
+        columns = list(zip(*group))
+        write(to_arrow([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+_ENCODERS = {
+    "csv": _encode_csv,
+    "ndjson": _encode_ndjson,
+    "parquet": lambda batches: _encode_columnar(batches, "parquet"),
+    "arrow": lambda batches: _encode_columnar(batches, "arrow"),
+}
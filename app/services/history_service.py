@@ -0,0 +1,935 @@
+"""
+Сервис истории метрик: часовые/дневные rollups, упаковка дней, ретенция, выбор разрешения
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, update, delete, case, text, cast, exists, true, Integer
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+
+from app.models.user import User
+from app.models.reel import Reel, ReelHistory, ALL_METRICS_OBSERVED
+from app.models.history import ReelHistoryHourly, ReelHistoryDaily, ReelHistoryPacked, RollupState
+from app.services.tariff_service import TARIFF_LIMITS
+from app.services.version_service import bump_data_version
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+METRICS = ("views", "likes", "comments", "shares")
+
+# Час сворачивается, когда закрыт и прошло ROLLUP_DELAY (поздние записи result writer)
+ROLLUP_DELAY = timedelta(minutes=5)
+# За один проход догоняем не больше недели, чтобы не держать длинную транзакцию
+ROLLUP_MAX_CATCHUP = timedelta(days=7)
+# Ретенция удаляет строки пачками
+RETENTION_BATCH_SIZE = 10000
+
+# Выбор разрешения: сырые точки — для диапазонов до 2 дней, часы — до 60 дней
+RAW_MAX_SPAN = timedelta(days=2)
+HOURLY_MAX_SPAN = timedelta(days=60)
+
+RESOLUTIONS = {"hourly": ReelHistoryHourly, "daily": ReelHistoryDaily}
+
+# Спарклайн рилса: views_last последних часовых корзин (не старше SPARKLINE_LOOKBACK)
+SPARKLINE_POINTS = 24
+SPARKLINE_LOOKBACK = timedelta(days=7)
+
+# Сколько точек диапазона читать перед прореживанием до max_points
+DOWNSAMPLE_SOURCE_LIMIT = 50000
+
+# Выгрузка: строк на выборку серверного курсора и колонки выгружаемой точки
+EXPORT_BATCH_SIZE = 5000
+EXPORT_FIELDS = ("reel_id", "parsed_at", "last_confirmed_at") + METRICS + ("observed",)
+
+# Параллельные массивы reel_history_packed
+PACKED_COLUMNS = ("offsets", "confirmed") + METRICS + ("observed",)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Секции reel_history: помесячные, создаются на HISTORY_PARTITIONS_AHEAD месяцев вперёд
+HISTORY_PARTITIONS_AHEAD = 2
+_PARTITION_NAME = re.compile(r"^reel_history_y(\d{4})m(\d{2})$")
+
+
+def _naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """Время из запроса (может быть с таймзоной) → naive UTC, как в БД"""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _get_watermark(db: Session, name: str) -> RollupState:
+    state = db.query(RollupState).filter(RollupState.name == name).with_for_update().first()
+    if state is None:
+        state = RollupState(name=name, watermark=_EPOCH)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def _started_at():
+    """Начало отрезка точки: для перенесённых из удалённой секции — исходное (carried_from)"""
+    return func.coalesce(ReelHistory.carried_from, ReelHistory.parsed_at)
+
+
+def _merge_on_conflict(stmt, model):
+    """ON CONFLICT: min/max сливаются, last берётся у более поздней точки"""
+    newer = stmt.excluded.last_at >= model.last_at
+    values = {"last_at": func.greatest(model.last_at, stmt.excluded.last_at)}
+    for name in METRICS:
+        values[f"{name}_min"] = func.least(getattr(model, f"{name}_min"), getattr(stmt.excluded, f"{name}_min"))
+        values[f"{name}_max"] = func.greatest(getattr(model, f"{name}_max"), getattr(stmt.excluded, f"{name}_max"))
+        values[f"{name}_last"] = case(
+            (newer, getattr(stmt.excluded, f"{name}_last")),
+            else_=getattr(model, f"{name}_last"),
+        )
+    return stmt.on_conflict_do_update(index_elements=["reel_id", "bucket_start"], set_=values)
+
+
+def rollup_hourly(db: Session, now: datetime) -> int:
+    """Свернуть сырые точки закрытых часов после водяного знака в reel_history_hourly"""
+    state = _get_watermark(db, "hourly")
+    if state.watermark == _EPOCH:
+        first = db.query(func.min(ReelHistory.parsed_at)).scalar()
+        if first is None:
+            db.commit()
+            return 0
+        state.watermark = _floor_hour(first)
+
+    upto = min(_floor_hour(now - ROLLUP_DELAY), state.watermark + ROLLUP_MAX_CATCHUP)
+    if upto <= state.watermark:
+        db.commit()
+        return 0
+
+    bucket = func.date_trunc("hour", ReelHistory.parsed_at)
+    columns = [ReelHistory.reel_id, bucket]
+    for name in METRICS:
+        col = getattr(ReelHistory, name)
+        columns += [
+            func.min(col),
+            func.max(col),
+            func.array_agg(aggregate_order_by(col, ReelHistory.parsed_at.desc()))[1],
+        ]
+    columns.append(func.max(ReelHistory.parsed_at))
+
+    source = (
+        select(*columns)
+        .where(ReelHistory.parsed_at >= state.watermark, ReelHistory.parsed_at < upto)
+        .group_by(ReelHistory.reel_id, bucket)
+    )
+    target = ["reel_id", "bucket_start"] + [
+        f"{name}_{agg}" for name in METRICS for agg in ("min", "max", "last")
+    ] + ["last_at"]
+
+    stmt = pg_insert(ReelHistoryHourly).from_select(target, source)
+    result = db.execute(_merge_on_conflict(stmt, ReelHistoryHourly))
+    refresh_sparklines(db, state.watermark)
+
+    state.watermark = upto
+    db.commit()
+    return result.rowcount
+
+
+def refresh_sparklines(db: Session, since: datetime) -> None:
+    """Пересчитать reels.sparkline у рилсов, получивших часовые корзины начиная с since"""
+    touched = select(ReelHistoryHourly.reel_id).where(ReelHistoryHourly.bucket_start >= since)
+    ranked = (
+        select(
+            ReelHistoryHourly.reel_id,
+            ReelHistoryHourly.bucket_start,
+            ReelHistoryHourly.views_last,
+            func.row_number().over(
+                partition_by=ReelHistoryHourly.reel_id,
+                order_by=ReelHistoryHourly.bucket_start.desc(),
+            ).label("rn"),
+        )
+        .where(
+            ReelHistoryHourly.reel_id.in_(touched),
+            ReelHistoryHourly.bucket_start >= since - SPARKLINE_LOOKBACK,
+        )
+        .subquery()
+    )
+    points = (
+        select(
+            ranked.c.reel_id,
+            func.array_agg(aggregate_order_by(ranked.c.views_last, ranked.c.bucket_start)).label("sparkline"),
+        )
+        .where(ranked.c.rn <= SPARKLINE_POINTS)
+        .group_by(ranked.c.reel_id)
+        .subquery()
+    )
+    updated = db.execute(
+        update(Reel)
+        .where(Reel.id == points.c.reel_id)
+        .values(sparkline=points.c.sparkline, updated_at=datetime.utcnow())
+        .returning(Reel.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    bump_data_version(db, updated)
+
+
+def rollup_daily(db: Session) -> int:
+    """Свернуть закрытые дни из часовых корзин в reel_history_daily"""
+    hourly = _get_watermark(db, "hourly")
+    state = _get_watermark(db, "daily")
+    if state.watermark == _EPOCH:
+        first = db.query(func.min(ReelHistoryHourly.bucket_start)).scalar()
+        if first is None:
+            db.commit()
+            return 0
+        state.watermark = _floor_day(first)
+
+    upto = min(_floor_day(hourly.watermark), state.watermark + ROLLUP_MAX_CATCHUP)
+    if upto <= state.watermark:
+        db.commit()
+        return 0
+
+    bucket = func.date_trunc("day", ReelHistoryHourly.bucket_start)
+    columns = [ReelHistoryHourly.reel_id, bucket]
+    for name in METRICS:
+        columns += [
+            func.min(getattr(ReelHistoryHourly, f"{name}_min")),
+            func.max(getattr(ReelHistoryHourly, f"{name}_max")),
+            func.array_agg(aggregate_order_by(
+                getattr(ReelHistoryHourly, f"{name}_last"), ReelHistoryHourly.last_at.desc(),
+            ))[1],
+        ]
+    columns.append(func.max(ReelHistoryHourly.last_at))
+
+    source = (
+        select(*columns)
+        .where(ReelHistoryHourly.bucket_start >= state.watermark, ReelHistoryHourly.bucket_start < upto)
+        .group_by(ReelHistoryHourly.reel_id, bucket)
+    )
+    target = ["reel_id", "bucket_start"] + [
+        f"{name}_{agg}" for name in METRICS for agg in ("min", "max", "last")
+    ] + ["last_at"]
+
+    stmt = pg_insert(ReelHistoryDaily).from_select(target, source)
+    result = db.execute(_merge_on_conflict(stmt, ReelHistoryDaily))
+
+    state.watermark = upto
+    db.commit()
+    return result.rowcount
+
+
+def pack_history(db: Session, now: datetime) -> int:
+    """
+    Упаковать сырые точки закрытых дней в reel_history_packed (PACKED_HISTORY).
+    Пакуются только дни, уже свёрнутые в часы, и только завершённые отрезки:
+    последняя точка рилса (её ещё подтверждают) остаётся строкой и
+    упаковывается следующим проходом, когда у рилса появится новая точка.
+    """
+    if not settings.PACKED_HISTORY:
+        return 0
+
+    hourly = _get_watermark(db, "hourly")
+    state = _get_watermark(db, "packed")
+    if state.watermark == _EPOCH:
+        first = db.query(func.min(ReelHistory.parsed_at)).scalar()
+        if first is None:
+            db.commit()
+            return 0
+        state.watermark = _floor_day(first)
+
+    upto = max(state.watermark, min(_floor_day(hourly.watermark), state.watermark + ROLLUP_MAX_CATCHUP))
+
+    newer = aliased(ReelHistory)
+    moved = (
+        delete(ReelHistory)
+        .where(
+            ReelHistory.parsed_at < upto,
+            exists().where(newer.reel_id == ReelHistory.reel_id, newer.parsed_at > ReelHistory.parsed_at),
+        )
+        .returning(
+            ReelHistory.reel_id,
+            ReelHistory.parsed_at,
+            _started_at().label("started_at"),
+            func.coalesce(ReelHistory.last_confirmed_at, ReelHistory.parsed_at).label("confirmed_at"),
+            *[getattr(ReelHistory, name) for name in METRICS],
+            ReelHistory.observed,
+        )
+        .cte("moved")
+    )
+
+    day = func.date_trunc("day", moved.c.parsed_at)
+
+    def ordered(expr):
+        return func.array_agg(aggregate_order_by(expr, moved.c.parsed_at))
+
+    def offset(column):
+        return cast(func.extract("epoch", column - day), Integer)
+
+    source = (
+        select(
+            moved.c.reel_id,
+            day,
+            ordered(offset(moved.c.started_at)),
+            ordered(offset(moved.c.confirmed_at)),
+            *[ordered(moved.c[name]) for name in METRICS],
+            ordered(moved.c.observed),
+        )
+        .group_by(moved.c.reel_id, day)
+    )
+    stmt = pg_insert(ReelHistoryPacked).from_select(["reel_id", "day", *PACKED_COLUMNS], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["reel_id", "day"],
+        # Догоняемые точки всегда позже уже упакованных — дописываем в конец
+        set_={
+            name: func.array_cat(getattr(ReelHistoryPacked, name), getattr(stmt.excluded, name))
+            for name in PACKED_COLUMNS
+        },
+    ).add_cte(moved)
+    result = db.execute(stmt)
+
+    state.watermark = upto
+    db.commit()
+    return result.rowcount
+
+
+def _delete_in_batches(db: Session, model, id_query) -> int:
+    """DELETE по пачкам первичных ключей, чтобы не держать длинные блокировки"""
+    total = 0
+    while True:
+        result = db.execute(
+            delete(model)
+            .where(model.id.in_(id_query.limit(RETENTION_BATCH_SIZE)))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < RETENTION_BATCH_SIZE:
+            return total
+
+
+def _month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return month_start.replace(year=index // 12, month=index % 12 + 1)
+
+
+def is_history_partitioned(db: Session) -> bool:
+    """reel_history уже секционирована (после миграции или на свежей БД)"""
+    relkind = db.execute(text(
+        "SELECT relkind FROM pg_class "
+        "WHERE relname = 'reel_history' AND relnamespace = 'public'::regnamespace"
+    )).scalar()
+    return relkind == "p"
+
+
+def _create_history_partition(db: Session, name: str, start: datetime, end: datetime) -> None:
+    """
+    Создать секцию месяца [start, end). Если DEFAULT уже хранит точки этого
+    месяца, CREATE ... PARTITION OF упадёт на проверке DEFAULT — поэтому
+    секция создаётся отдельной таблицей, точки переносятся в неё из DEFAULT
+    и секция присоединяется ATTACH PARTITION, всё в одной транзакции.
+    """
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    params = {"start": start, "end": end}
+
+    overlaps = db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM reel_history_default WHERE parsed_at >= :start AND parsed_at < :end)"
+    ), params).scalar()
+    if not overlaps:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF reel_history {bounds}"))
+        return
+
+    db.execute(text(f"CREATE TABLE {name} (LIKE reel_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = db.execute(text(
+        f"WITH moved AS ("
+        f"DELETE FROM reel_history_default WHERE parsed_at >= :start AND parsed_at < :end RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    db.execute(text(f"ALTER TABLE reel_history ATTACH PARTITION {name} {bounds}"))
+    logger.info(f"📦 В секцию {name} перенесено из DEFAULT точек: {moved.rowcount}")
+
+
+def ensure_history_partitions(db: Session, now: datetime) -> None:
+    """
+    Создать DEFAULT-секцию и помесячные секции до HISTORY_PARTITIONS_AHEAD
+    месяцев вперёд. Каждая секция создаётся в своей транзакции: ошибка на
+    одном месяце не откатывает остальные и не останавливает rollups.
+    """
+    if not is_history_partitioned(db):
+        return
+
+    db.execute(text("CREATE TABLE IF NOT EXISTS reel_history_default PARTITION OF reel_history DEFAULT"))
+    db.commit()
+
+    existing = {name for name, _ in _history_partitions(db)}
+    month = _month_start(now)
+    for i in range(HISTORY_PARTITIONS_AHEAD + 1):
+        start = _add_months(month, i)
+        name = f"reel_history_y{start.year:04d}m{start.month:02d}"
+        if name in existing:
+            continue
+        try:
+            _create_history_partition(db, name, start, _add_months(start, 1))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"❌ Не удалось создать секцию истории {name}: {e}")
+
+
+def _history_partitions(db: Session) -> List[tuple]:
+    """Помесячные секции reel_history: (имя, начало месяца)"""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'reel_history'"
+    )).scalars().all()
+
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def drop_expired_history_partitions(db: Session, now: datetime, hourly_wm: datetime) -> int:
+    """
+    Ретенция сырых точек удалением целых секций: секция удаляется, когда
+    весь её месяц старше самой длинной ретенции тарифов и уже свёрнут в часы.
+    Отрезки, которые ещё подтверждаются, переносятся в начало следующего
+    месяца; исходное начало отрезка сохраняется в carried_from, и чтение
+    отдаёт именно его.
+    """
+    if not is_history_partitioned(db):
+        return 0
+
+    keep_days = max(limits["raw_history_days"] for limits in TARIFF_LIMITS.values())
+    cutoff = min(now - timedelta(days=keep_days), hourly_wm)
+
+    dropped = 0
+    for name, start in _history_partitions(db):
+        end = _add_months(start, 1)
+        if end > cutoff:
+            break
+
+        db.execute(text(
+            f"INSERT INTO reel_history "
+            f"(reel_id, views, likes, comments, shares, observed, parsed_at, last_confirmed_at, carried_from) "
+            f"SELECT reel_id, views, likes, comments, shares, observed, :end, last_confirmed_at, "
+            f"coalesce(carried_from, parsed_at) "
+            f"FROM {name} WHERE last_confirmed_at >= :end"
+        ), {"end": end})
+        db.execute(text(f"ALTER TABLE reel_history DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        dropped += 1
+        logger.info(f"🧹 Удалена секция истории {name}")
+
+    return dropped
+
+
+def apply_history_retention(db: Session, now: datetime) -> dict:
+    """
+    Удалить сырые точки и часовые корзины старше ретенции тарифа.
+    Удаляется только то, что уже свёрнуто (раньше водяного знака).
+    Старые месяцы сырых точек удаляются целыми секциями; DELETE пачками
+    остаётся для тарифов с ретенцией короче самой длинной.
+    """
+    hourly_wm = _get_watermark(db, "hourly").watermark
+    daily_wm = _get_watermark(db, "daily").watermark
+    db.commit()
+
+    deleted = {"partitions": drop_expired_history_partitions(db, now, hourly_wm), "raw": 0, "packed": 0, "hourly": 0}
+    packed_last_confirmed = ReelHistoryPacked.day + func.make_interval(
+        0, 0, 0, 0, 0, 0, ReelHistoryPacked.confirmed[func.cardinality(ReelHistoryPacked.confirmed)],
+    )
+    for tariff, limits in TARIFF_LIMITS.items():
+        tariff_reels = select(Reel.id).join(User, User.id == Reel.user_id).where(User.tariff == tariff)
+
+        raw_cutoff = min(now - timedelta(days=limits["raw_history_days"]), hourly_wm)
+        deleted["raw"] += _delete_in_batches(
+            db, ReelHistory,
+            select(ReelHistory.id).where(
+                ReelHistory.reel_id.in_(tariff_reels),
+                # Отрезок, который всё ещё подтверждается, не трогаем
+                func.coalesce(ReelHistory.last_confirmed_at, ReelHistory.parsed_at) < raw_cutoff,
+            ),
+        )
+
+        result = db.execute(
+            delete(ReelHistoryPacked)
+            .where(
+                ReelHistoryPacked.reel_id.in_(tariff_reels),
+                packed_last_confirmed < raw_cutoff,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        deleted["packed"] += result.rowcount
+
+        hourly_cutoff = min(now - timedelta(days=limits["hourly_history_days"]), daily_wm)
+        result = db.execute(
+            delete(ReelHistoryHourly)
+            .where(
+                ReelHistoryHourly.reel_id.in_(tariff_reels),
+                ReelHistoryHourly.bucket_start < hourly_cutoff,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        deleted["hourly"] += result.rowcount
+
+    return deleted
+
+
+def pick_resolution(user: User, start: datetime, end: datetime, now: datetime) -> str:
+    """Самое подробное разрешение, которое покрывает диапазон и не слишком велико"""
+    limits = TARIFF_LIMITS[user.tariff]
+    span = end - start
+    if span <= RAW_MAX_SPAN and start >= now - timedelta(days=limits["raw_history_days"]):
+        return "raw"
+    if span <= HOURLY_MAX_SPAN and start >= now - timedelta(days=limits["hourly_history_days"]):
+        return "hourly"
+    return "daily"
+
+
+def _point(h: ReelHistory) -> dict:
+    return {
+        "id": h.id,
+        "views": h.views,
+        "likes": h.likes,
+        "comments": h.comments,
+        "shares": h.shares,
+        "observed": h.observed,
+        "parsed_at": h.carried_from or h.parsed_at,
+        "last_confirmed_at": h.last_confirmed_at,
+    }
+
+
+def _bucket_point(r) -> dict:
+    """Часовая/дневная корзина → точка со значениями на конец корзины"""
+    return {
+        "id": None,
+        "views": r.views_last,
+        "likes": r.likes_last,
+        "comments": r.comments_last,
+        "shares": r.shares_last,
+        "observed": ALL_METRICS_OBSERVED,
+        "parsed_at": r.bucket_start,
+        "last_confirmed_at": r.last_at,
+    }
+
+
+def _unpack(row: ReelHistoryPacked) -> List[dict]:
+    """Упакованный день → точки по возрастанию времени"""
+    return [
+        {
+            "id": None,
+            "views": row.views[i],
+            "likes": row.likes[i],
+            "comments": row.comments[i],
+            "shares": row.shares[i],
+            "observed": row.observed[i],
+            "parsed_at": row.day + timedelta(seconds=offset),
+            "last_confirmed_at": row.day + timedelta(seconds=row.confirmed[i]),
+        }
+        for i, offset in enumerate(row.offsets)
+    ]
+
+
+def _raw_points(db: Session, reel_id: int, start: datetime, end: datetime, limit: int) -> List[dict]:
+    """Последние limit сырых точек диапазона по возрастанию времени"""
+    rows = (
+        db.query(ReelHistory)
+        .filter(
+            ReelHistory.reel_id == reel_id,
+            ReelHistory.parsed_at >= start,
+            ReelHistory.parsed_at <= end,
+        )
+        .order_by(ReelHistory.parsed_at.desc())
+        .limit(limit)
+        .all()
+    )
+    points = [_point(h) for h in reversed(rows)]
+    if len(points) >= limit:
+        return points
+
+    # Упакованные дни всегда старше строк рилса — добираем их самые новые точки
+    packed = (
+        db.query(ReelHistoryPacked)
+        .filter(
+            ReelHistoryPacked.reel_id == reel_id,
+            ReelHistoryPacked.day >= _floor_day(start),
+            ReelHistoryPacked.day <= end,
+        )
+        .order_by(ReelHistoryPacked.day.asc())
+        .all()
+    )
+    older = [p for row in packed for p in _unpack(row) if start <= p["parsed_at"] <= end]
+    points = older[max(0, len(older) - (limit - len(points))):] + points
+    points.sort(key=lambda p: p["parsed_at"])
+    return points
+
+
+def _seed_points(db: Session, reel_ids: List[int], start: datetime) -> Dict[int, dict]:
+    """
+    Отрезки, начатые до start и ещё действующие в start: история хранит
+    только изменения, и у рилса с неизменными метриками в диапазоне может
+    не быть ни одной точки. Последняя точка до start (LATERAL по индексу
+    (reel_id, parsed_at), затем упакованные дни) обрезается до start.
+    """
+    seeds, found = {}, set()
+    ids = select(Reel.id).where(Reel.id.in_(reel_ids)).subquery("ids")
+
+    latest = (
+        select(ReelHistory)
+        .where(ReelHistory.reel_id == ids.c.id, ReelHistory.parsed_at < start)
+        .order_by(ReelHistory.parsed_at.desc())
+        .limit(1)
+        .lateral("latest")
+    )
+    for r in db.execute(select(latest).select_from(ids.join(latest, true()))):
+        found.add(r.reel_id)
+        if (r.last_confirmed_at or r.parsed_at) >= start:
+            seeds[r.reel_id] = {**_point(r), "parsed_at": start}
+
+    # Строки всегда новее упакованных дней: без строки до start — смотрим дни.
+    # Два дня: в дне самого start все точки могут быть позже start
+    missing = [reel_id for reel_id in reel_ids if reel_id not in found]
+    if missing:
+        ids = select(Reel.id).where(Reel.id.in_(missing)).subquery("ids")
+        days = (
+            select(ReelHistoryPacked)
+            .where(ReelHistoryPacked.reel_id == ids.c.id, ReelHistoryPacked.day < start)
+            .order_by(ReelHistoryPacked.day.desc())
+            .limit(2)
+            .lateral("days")
+        )
+        before = {}
+        for row in db.execute(select(days).select_from(ids.join(days, true()))):
+            for p in _unpack(row):
+                last = before.get(row.reel_id)
+                if p["parsed_at"] < start and (last is None or p["parsed_at"] > last["parsed_at"]):
+                    before[row.reel_id] = p
+        for reel_id, p in before.items():
+            if p["last_confirmed_at"] >= start:
+                seeds[reel_id] = {**p, "parsed_at": start}
+    return seeds
+
+
+def _with_seeds(db: Session, points: Dict[int, List[dict]], start: datetime) -> Dict[int, List[dict]]:
+    """Дополнить ряды, у которых нет точки в самом start, действующим в start отрезком"""
+    if start <= _EPOCH:
+        return points
+    unseeded = [reel_id for reel_id, series in points.items() if not series or series[0]["parsed_at"] > start]
+    if unseeded:
+        for reel_id, seed in _seed_points(db, unseeded, start).items():
+            points[reel_id].insert(0, seed)
+    return points
+
+
+def _raw_points_many(db: Session, reel_ids: List[int], start: datetime, end: datetime) -> Dict[int, List[dict]]:
+    """Сырые точки нескольких рилсов: по запросу на упакованные дни и на строки"""
+    points = {reel_id: [] for reel_id in reel_ids}
+    packed = (
+        db.query(ReelHistoryPacked)
+        .filter(
+            ReelHistoryPacked.reel_id.in_(reel_ids),
+            ReelHistoryPacked.day >= _floor_day(start),
+            ReelHistoryPacked.day <= end,
+        )
+        .order_by(ReelHistoryPacked.reel_id, ReelHistoryPacked.day.asc())
+    )
+    for row in packed:
+        points[row.reel_id] += [p for p in _unpack(row) if start <= p["parsed_at"] <= end]
+
+    # Строки всегда новее упакованных дней рилса — порядок сохраняется
+    rows = (
+        db.query(ReelHistory)
+        .filter(
+            ReelHistory.reel_id.in_(reel_ids),
+            ReelHistory.parsed_at >= start,
+            ReelHistory.parsed_at <= end,
+        )
+        .order_by(ReelHistory.reel_id, ReelHistory.parsed_at.asc())
+    )
+    for h in rows:
+        points[h.reel_id].append(_point(h))
+    return points
+
+
+def get_points_since(db: Session, reel_ids: List[int], since: datetime) -> dict:
+    """Точки рилсов, созданные или подтверждённые после since: {reel_id: [точки по возрастанию]}"""
+    rows = (
+        db.query(ReelHistory)
+        .filter(
+            ReelHistory.reel_id.in_(reel_ids),
+            func.coalesce(ReelHistory.last_confirmed_at, ReelHistory.parsed_at) > since,
+        )
+        .order_by(ReelHistory.reel_id, ReelHistory.parsed_at.asc())
+        .all()
+    )
+    points = {}
+    for h in rows:
+        points.setdefault(h.reel_id, []).append(_point(h))
+    return points
+
+
+def get_latest_points(db: Session, reel_id: int, limit: int) -> List[dict]:
+    """Последние limit сырых точек рилса, новые первыми: строки, затем упакованные дни"""
+    rows = (
+        db.query(ReelHistory)
+        .filter(ReelHistory.reel_id == reel_id)
+        .order_by(ReelHistory.parsed_at.desc())
+        .limit(limit)
+        .all()
+    )
+    points = [_point(h) for h in rows]
+    if len(points) >= limit:
+        return points
+
+    # Строки всегда новее упакованных дней рилса
+    packed = (
+        db.query(ReelHistoryPacked)
+        .filter(ReelHistoryPacked.reel_id == reel_id)
+        .order_by(ReelHistoryPacked.day.desc())
+        .yield_per(8)
+    )
+    for row in packed:
+        for point in reversed(_unpack(row)):
+            points.append(point)
+            if len(points) >= limit:
+                return points
+    return points
+
+
+def iter_history_export(
+    db: Session,
+    reel_ids: List[int],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[List[tuple]]:
+    """
+    Сырые точки рилсов пачками кортежей EXPORT_FIELDS: рилс за рилсом,
+    внутри рилса по возрастанию времени. Упакованные дни и строки
+    reel_history читаются серверными курсорами, ORM-объекты не создаются —
+    память не зависит от объёма выгрузки.
+    """
+    start = _naive_utc(start) or _EPOCH
+    end = _naive_utc(end) or datetime.utcnow()
+    raw_columns = [ReelHistory.reel_id] + [
+        _started_at().label(name) if name == "parsed_at" else getattr(ReelHistory, name)
+        for name in EXPORT_FIELDS[1:]
+    ]
+
+    for reel_id in reel_ids:
+        # Упакованные дни всегда старше строк рилса
+        packed = db.execute(
+            select(ReelHistoryPacked.day, *[getattr(ReelHistoryPacked, name) for name in PACKED_COLUMNS])
+            .where(
+                ReelHistoryPacked.reel_id == reel_id,
+                ReelHistoryPacked.day >= _floor_day(start),
+                ReelHistoryPacked.day <= end,
+            )
+            .order_by(ReelHistoryPacked.day.asc())
+            .execution_options(yield_per=8)
+        )
+        for row in packed:
+            batch = [
+                (reel_id,) + tuple(p[name] for name in EXPORT_FIELDS[1:])
+                for p in _unpack(row)
+                if start <= p["parsed_at"] <= end
+            ]
+            if batch:
+                yield batch
+
+        rows = db.execute(
+            select(*raw_columns)
+            .where(
+                ReelHistory.reel_id == reel_id,
+                ReelHistory.parsed_at >= start,
+                ReelHistory.parsed_at <= end,
+            )
+            .order_by(ReelHistory.parsed_at.asc())
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for partition in rows.partitions():
+            yield [tuple(r) for r in partition]
+
+
+def downsample_lttb(points: List[dict], max_points: int, metric: str = "views") -> List[dict]:
+    """
+    Largest-Triangle-Three-Buckets: оставить max_points точек, сохраняющих
+    форму ряда metric. Первая и последняя точки остаются всегда.
+
+    Средние корзин и коэффициенты площадей считаются NumPy сразу для всех
+    точек; по корзинам идёт только выбор вершины (он зависит от предыдущей).
+    """
+    n = len(points)
+    if max_points >= n or max_points < 3:
+        return points
+
+    # Сдвиг к первой точке не меняет площадей, но бережёт точность float64
+    base = points[0]["parsed_at"]
+    xs = np.fromiter(((p["parsed_at"] - base).total_seconds() for p in points), np.float64, n)
+    ys = np.fromiter((p[metric] or 0 for p in points), np.float64, n)
+    every = (n - 2) / (max_points - 2)
+
+    buckets = np.arange(max_points - 2)
+    lo = (buckets * every).astype(np.int64) + 1
+    hi = ((buckets + 1) * every).astype(np.int64) + 1
+
+    # Средняя точка следующей корзины — третья вершина треугольника
+    avg_start = hi
+    avg_end = np.maximum(np.minimum(((buckets + 2) * every).astype(np.int64) + 1, n), avg_start + 1)
+    cx = np.concatenate(([0.0], np.cumsum(xs)))
+    cy = np.concatenate(([0.0], np.cumsum(ys)))
+    avg_x = (cx[avg_end] - cx[avg_start]) / (avg_end - avg_start)
+    avg_y = (cy[avg_end] - cy[avg_start]) / (avg_end - avg_start)
+
+    # Площадь треугольника (a, j, avg) = |xa * P + ya * Q + R| — P, Q, R не зависят от a
+    owner = np.repeat(buckets, hi - lo)
+    ax, ay = avg_x[owner], avg_y[owner]
+    bx, by = xs[1:hi[-1]], ys[1:hi[-1]]
+    P = by - ay
+    Q = ax - bx
+    R = bx * ay - ax * by
+
+    selected = [0]
+    a = 0
+    x_list, y_list = xs.tolist(), ys.tolist()
+    for start, end in zip((lo - 1).tolist(), (hi - 1).tolist()):
+        area = np.abs(x_list[a] * P[start:end] + y_list[a] * Q[start:end] + R[start:end])
+        a = start + 1 + int(area.argmax())
+        selected.append(a)
+
+    selected.append(n - 1)
+    return [points[i] for i in selected]
+
+
+def get_history_range_many(
+    db: Session,
+    reel_ids: List[int],
+    user: User,
+    start: datetime,
+    end: datetime,
+) -> Tuple[str, Dict[int, List[dict]]]:
+    """
+    История нескольких рилсов за диапазон в одном разрешении: запрос на
+    источник, а не на рилс. Возвращает (разрешение, {reel_id: точки по возрастанию}).
+    """
+    resolution = pick_resolution(user, start, end, datetime.utcnow())
+    if resolution == "raw":
+        return resolution, _with_seeds(db, _raw_points_many(db, reel_ids, start, end), start)
+
+    model = RESOLUTIONS[resolution]
+    points = {reel_id: [] for reel_id in reel_ids}
+    rows = (
+        db.query(model)
+        .filter(
+            model.reel_id.in_(reel_ids),
+            model.bucket_start >= start,
+            model.bucket_start <= end,
+        )
+        .order_by(model.reel_id, model.bucket_start.asc())
+    )
+    for r in rows:
+        points[r.reel_id].append(_bucket_point(r))
+
+    watermark = db.query(RollupState.watermark).filter(RollupState.name == resolution).scalar()
+    tail_start = max(start, watermark or _EPOCH)
+    if tail_start < end:
+        for reel_id, tail in _raw_points_many(db, reel_ids, tail_start, end).items():
+            points[reel_id] += tail
+    return resolution, _with_seeds(db, points, start)
+
+
+def align_series(points: List[dict], grid: List[datetime], metrics) -> Dict[str, list]:
+    """
+    Значения ряда в моменты grid: последняя точка не позже момента
+    (история хранит только изменения). До первой точки — None; ряды
+    get_history_range_many уже начинаются с отрезка, действующего в start.
+    """
+    values = {name: [] for name in metrics}
+    current, i = None, 0
+    for t in grid:
+        while i < len(points) and points[i]["parsed_at"] <= t:
+            current = points[i]
+            i += 1
+        for name in metrics:
+            values[name].append(current[name] if current is not None else None)
+    return values
+
+
+def history_columns(points: List[dict]) -> dict:
+    """
+    Точки в колоночном виде {t: [...], views: [...], ...}: ключи не
+    повторяются на каждой точке, ответ меньше и кодируется быстрее.
+    """
+    return {
+        "t": [p["parsed_at"] for p in points],
+        "confirmed": [p["last_confirmed_at"] for p in points],
+        "id": [p["id"] for p in points],
+        **{name: [p[name] for p in points] for name in METRICS},
+        "observed": [p["observed"] for p in points],
+    }
+
+
+def get_history_range(
+    db: Session,
+    reel_id: int,
+    user: User,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int,
+) -> List[dict]:
+    """
+    История рилса за диапазон в подходящем разрешении (по возрастанию времени).
+    Для часов и дней хвост после водяного знака добирается сырыми точками.
+    Если точек больше limit, отдаются последние limit — самые свежие данные
+    диапазона не теряются. Отрезок, начатый до start и действующий в start,
+    становится первой точкой (в момент start).
+    """
+    now = datetime.utcnow()
+    end = _naive_utc(end) or now
+    start = _naive_utc(start) or _EPOCH
+
+    resolution = pick_resolution(user, start, end, now)
+    if resolution == "raw":
+        points = _raw_points(db, reel_id, start, end, limit)
+        return _with_seeds(db, {reel_id: points}, start)[reel_id] if len(points) < limit else points
+
+    model = RESOLUTIONS[resolution]
+    watermark = db.query(RollupState.watermark).filter(RollupState.name == resolution).scalar()
+    tail_start = max(start, watermark or _EPOCH)
+    tail = _raw_points(db, reel_id, tail_start, end, limit) if tail_start < end else []
+    if len(tail) >= limit:
+        return tail
+
+    rows = (
+        db.query(model)
+        .filter(
+            model.reel_id == reel_id,
+            model.bucket_start >= start,
+            model.bucket_start <= end,
+        )
+        .order_by(model.bucket_start.desc())
+        .limit(limit - len(tail))
+        .all()
+    )
+    points = [_bucket_point(r) for r in reversed(rows)] + tail
+    return _with_seeds(db, {reel_id: points}, start)[reel_id] if len(points) < limit else points
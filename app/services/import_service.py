@@ -0,0 +1,198 @@
+"""
+Сервис массового импорта рилсов
+
+Список URL (JSON или CSV) канонизируется и дедуплицируется в памяти,
+лимит тарифа проверяется один раз, вставка — многострочными INSERT
+с ON CONFLICT по (user_id, url). По каждой строке входа — результат.
+"""
+
+import csv
+import io
+from typing import List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.user import User
+from app.models.reel import Reel
+from app.services.tariff_service import TARIFF_LIMITS
+from app.services.stats_service import refresh_user_stats
+from app.services.version_service import bump_data_version
+
+# Не больше строк за один импорт и строк в одном INSERT
+IMPORT_MAX_ROWS = 10000
+IMPORT_BATCH_SIZE = 1000
+
+# Домен без www./m. → платформа и канонический хост
+PLATFORM_HOSTS = {
+    "instagram.com": ("instagram", "www.instagram.com"),
+    "tiktok.com": ("tiktok", "www.tiktok.com"),
+    "vm.tiktok.com": ("tiktok", "vm.tiktok.com"),
+    "youtube.com": ("youtube", "www.youtube.com"),
+    "youtu.be": ("youtube", "youtu.be"),
+    "vk.com": ("vk", "vk.com"),
+    "vkvideo.ru": ("vk", "vkvideo.ru"),
+}
+PLATFORMS = ("instagram", "tiktok", "youtube", "vk")
+
+
+def _split_host(url: str):
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.hostname or ""
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return parts, host
+
+
+def canonical_url(url: str) -> str:
+    """
+    Канонический URL для дедупликации: https, хост платформы в одном
+    написании, без фрагмента и трекинговых параметров (у YouTube остаётся v,
+    у VK query сохраняется — в нём бывает id клипа).
+
+    Канонизируются только http(s)-ссылки на известные платформы (схема
+    может быть опущена). Всё остальное — например, голый shortcode
+    Instagram — возвращается как есть: регистр shortcode значим.
+    """
+    stripped = url.strip()
+    scheme = urlsplit(stripped).scheme.lower() if "://" in stripped else "https"
+    if scheme not in ("http", "https"):
+        return url
+
+    parts, host = _split_host(stripped)
+    if host not in PLATFORM_HOSTS:
+        return url
+    platform, canonical_host = PLATFORM_HOSTS[host]
+
+    if platform == "vk":
+        query = parts.query
+    elif platform == "youtube":
+        query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if k == "v"])
+    else:
+        query = ""
+    return urlunsplit(("https", canonical_host, parts.path or "/", query, ""))
+
+
+def detect_platform(url: str) -> Optional[str]:
+    """Платформа по хосту URL, None — неизвестный хост"""
+    return PLATFORM_HOSTS.get(_split_host(url)[1], (None, None))[0]
+
+
+def _default_title(url: str, platform: str) -> str:
+    parts = urlsplit(url)
+    video_id = dict(parse_qsl(parts.query)).get("v") or parts.path.rstrip("/").rsplit("/", 1)[-1]
+    return f"{platform} {video_id}".strip()[:255]
+
+
+def parse_import_csv(content: bytes) -> List[dict]:
+    """
+    Строки CSV → [{url, title, platform}]. Заголовок (с колонкой url)
+    необязателен; без него колонки по порядку: url, title, platform.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV должен быть в кодировке UTF-8",
+        )
+
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    columns = ["url", "title", "platform"]
+    if rows and rows[0][0].strip().lower() == "url":
+        columns = [cell.strip().lower() for cell in rows.pop(0)]
+
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {IMPORT_MAX_ROWS} строк за один импорт",
+        )
+    return [
+        {name: (value.strip() or None) for name, value in zip(columns, row) if name in ("url", "title", "platform")}
+        for row in rows
+    ]
+
+
+def import_reels(db: Session, user: User, items: List[dict]) -> dict:
+    """
+    Добавить рилсы пачкой. Статусы строк: created, exists (уже отслеживается),
+    duplicate (повтор строки выше), invalid, limit (не хватило лимита тарифа).
+    Постановку созданных рилсов в очередь делает вызывающий.
+    """
+    results = []
+    new_rows = {}  # канонический URL → результат строки
+
+    for row, item in enumerate(items, start=1):
+        raw_url = (item.get("url") or "").strip()
+        url = canonical_url(raw_url) if raw_url else ""
+        platform = item.get("platform") or detect_platform(url)
+        result = {"row": row, "url": url or raw_url, "status": "invalid", "reel_id": None, "detail": None}
+        results.append(result)
+
+        if not 10 <= len(url) <= 1024:
+            result["detail"] = "Некорректный URL"
+        elif platform not in PLATFORMS:
+            result["detail"] = "Не удалось определить платформу"
+        elif url in new_rows:
+            result["status"] = "duplicate"
+            result["detail"] = f"Повтор строки {new_rows[url]['row']}"
+        else:
+            result["status"] = None
+            result["values"] = {
+                "user_id": user.id,
+                "url": url,
+                "platform": platform,
+                "title": (item.get("title") or "").strip()[:255] or _default_title(url, platform),
+            }
+            new_rows[url] = result
+
+    # Блокировка юзера: параллельные импорты не превысят лимит вместе
+    db.query(User.id).filter(User.id == user.id).with_for_update().one()
+
+    # Одним запросом — и число рилсов для лимита, и уже отслеживаемые URL
+    # (сравнение по каноническому виду ловит и старые записи с www/utm)
+    existing = {
+        canonical_url(url): reel_id
+        for reel_id, url in db.query(Reel.id, Reel.url).filter(Reel.user_id == user.id)
+    }
+    remaining = TARIFF_LIMITS[user.tariff]["max_reels"] - len(existing)
+
+    to_insert = []
+    for url, result in new_rows.items():
+        if url in existing:
+            result.update(status="exists", reel_id=existing[url])
+        elif len(to_insert) >= remaining:
+            result.update(status="limit", detail="Достигнут лимит рилсов на вашем тарифе")
+        else:
+            to_insert.append(result)
+
+    for i in range(0, len(to_insert), IMPORT_BATCH_SIZE):
+        batch = to_insert[i:i + IMPORT_BATCH_SIZE]
+        created = dict(db.execute(
+            pg_insert(Reel)
+            .values([result["values"] for result in batch])
+            .on_conflict_do_nothing(constraint="uq_user_url")
+            .returning(Reel.url, Reel.id)
+        ).all())
+        for result in batch:
+            if result["url"] in created:
+                result.update(status="created", reel_id=created[result["url"]])
+            else:
+                result["status"] = "exists"
+
+    created_count = sum(1 for result in results if result["status"] == "created")
+    if created_count:
+        refresh_user_stats(db, [user.id])
+        bump_data_version(db, [user.id])
+    db.commit()
+
+    for result in new_rows.values():
+        result.pop("values", None)
+    return {
+        "created": created_count,
+        "skipped": len(results) - created_count,
+        "results": results,
+    }
@@ -4,60 +4,120 @@
 
 import logging
 from datetime import datetime, timedelta
-from typing import Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import List, Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import (
+    func, select, update, insert, values, column, cast, literal, or_, case,
+    Integer, Float, DateTime, Text, Boolean,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.user import User
-from app.models.reel import Reel
-from app.models.parsing import ParseJob, JobStatus
-from app.services.tariff_service import get_parse_interval, get_priority
+from app.models.reel import Reel, ReelHistory
+from app.models.parsing import ParseJob, JobStatus, JobClass, JobType, JOB_CLASS_ORDER, ACTIVE_JOB_WHERE
+from app.services.tariff_service import TARIFF_LIMITS, get_parse_interval, get_priority, tariff_case
+from app.services.event_service import notify_events
+from app.services.stats_service import apply_metric_deltas, refresh_top_reels
+from app.services.version_service import bump_data_version
 
 logger = logging.getLogger(__name__)
 
+# Сколько строк отправлять в одном INSERT
+ENQUEUE_BATCH_SIZE = 1000
 
-def create_parse_job(db: Session, user: User, reel: Reel) -> ParseJob:
-    """Создать задачу парсинга в очередь"""
+# Fair-share очередь: окно учёта обслуженных задач и скорость aging
+FAIR_SHARE_WINDOW_MINUTES = 10
+QUEUE_AGING_SECONDS = 60  # минута ожидания = одна задача «долга»
+FAIR_SHARE_CANDIDATES = 5
 
-    # Проверяем, нет ли уже pending/running задачи для этого рилса
-    existing = db.query(ParseJob).filter(
-        ParseJob.reel_id == reel.id,
-        ParseJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
-    ).first()
+# Аренда RUNNING задачи: после неё задача считается потерянной и возвращается в очередь
+JOB_LEASE_MINUTES = 10
 
-    if existing:
-        logger.info(f"Задача для reel_id={reel.id} уже в очереди (job_id={existing.id}, status={existing.status})")
-        return existing  # Уже в очереди
 
-    job = ParseJob(
-        reel_id=reel.id,
-        user_id=user.id,
-        status=JobStatus.PENDING,
-        priority=get_priority(user),
+def insert_parse_jobs(db: Session, rows: List[dict]) -> int:
+    """
+    Многострочный INSERT задач без дублей (без commit).
+
+    Опирается на частичный уникальный индекс uq_parse_jobs_active_reel:
+    рилсы, у которых уже есть pending/running задача, пропускаются через
+    ON CONFLICT DO NOTHING. Возвращает число реально созданных задач.
+    """
+    if not rows:
+        return 0
+
+    stmt = (
+        pg_insert(ParseJob)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["reel_id"], index_where=ACTIVE_JOB_WHERE)
+        .returning(ParseJob.id, ParseJob.user_id)
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
-    logger.info(f"✅ Создана задача #{job.id} для reel_id={reel.id}")
-    return job
+    return len(db.execute(stmt).all())
 
 
-def create_parse_jobs_for_user(db: Session, user: User) -> list:
-    """Поставить все активные рилсы юзера в очередь"""
-    reels = db.query(Reel).filter(
-        Reel.user_id == user.id,
-        Reel.enabled == True,
-    ).all()
+def enqueue_parse_jobs(
+    db: Session,
+    user: User,
+    reel_ids: List[int],
+    job_class: JobClass = JobClass.SCHEDULED,
+) -> dict:
+    """
+    Поставить рилсы юзера в очередь пачкой (идемпотентно).
+
+    Для INTERACTIVE уже ожидающие задачи этих рилсов переводятся
+    в экспресс-полосу и в полный парсинг, чтобы ручной запуск не ждал плановую волну.
+    """
+    reel_ids = list(dict.fromkeys(reel_ids))
+    now = datetime.utcnow()
+    priority = get_priority(user)
+
+    created = promoted = 0
+    for i in range(0, len(reel_ids), ENQUEUE_BATCH_SIZE):
+        batch = reel_ids[i:i + ENQUEUE_BATCH_SIZE]
+        created += insert_parse_jobs(db, [
+            {
+                "reel_id": reel_id,
+                "user_id": user.id,
+                "status": JobStatus.PENDING,
+                "priority": priority,
+                "job_class": job_class,
+                "job_type": JobType.FULL,
+                "created_at": now,
+            }
+            for reel_id in batch
+        ])
+        if job_class == JobClass.INTERACTIVE:
+            promoted += db.query(ParseJob).filter(
+                ParseJob.reel_id.in_(batch),
+                ParseJob.status == JobStatus.PENDING,
+                ParseJob.job_class != JobClass.INTERACTIVE,
+            ).update(
+                # Запуск юзером — всегда полный парсинг, даже если плановая задача была lite
+                {ParseJob.job_class: JobClass.INTERACTIVE, ParseJob.job_type: JobType.FULL},
+                synchronize_session=False,
+            )
+    # Запуск юзером сразу виден в его ответах; плановые постановки и захват
+    # задач воркером data_version не трогают — статус очереди и так
+    # перечитывается раз в STATUS_ETAG_SECONDS (соль ETag /parsing/status)
+    if job_class == JobClass.INTERACTIVE and created + promoted:
+        bump_data_version(db, [user.id])
+    db.commit()
+
+    already_queued = len(reel_ids) - created
+    logger.info(f"✅ user_id={user.id}: создано {created} задач, уже в очереди {already_queued}")
+    return {"created": created, "already_queued": already_queued}
 
-    logger.info(f"Найдено {len(reels)} активных рилсов для user_id={user.id}")
 
-    jobs = []
-    for reel in reels:
-        job = create_parse_job(db, user, reel)
-        jobs.append(job)
+def enqueue_user_reels(db: Session, user: User, job_class: JobClass = JobClass.SCHEDULED) -> dict:
+    """Поставить все активные рилсы юзера в очередь"""
+    reel_ids = [
+        reel_id for (reel_id,) in db.query(Reel.id).filter(
+            Reel.user_id == user.id,
+            Reel.enabled == True,
+        )
+    ]
 
-    logger.info(f"Создано {len(jobs)} задач для user_id={user.id}")
-    return jobs
+    logger.info(f"Найдено {len(reel_ids)} активных рилсов для user_id={user.id}")
+    return enqueue_parse_jobs(db, user, reel_ids, job_class)
 
 
 def get_parse_status(db: Session, user: User) -> dict:
@@ -92,9 +152,14 @@ def get_parse_status(db: Session, user: User) -> dict:
             can_parse = False
             next_allowed = next_time.isoformat()
 
+    lag = get_queue_lag(db, user.id)
+
     return {
         "pending": pending_count,
         "running": running_count,
+        "queue_lag_seconds": lag[0]["lag_seconds"] if lag else 0.0,
+        "avg_wait_seconds": lag[0]["avg_wait_seconds"] if lag else None,
+        "time_to_first_metric": get_interactive_latency(db, user.id),
         "last_completed": last_completed.completed_at.isoformat() if last_completed and last_completed.completed_at else None,
         "parse_interval_minutes": interval,
         "can_parse": can_parse,
@@ -102,38 +167,420 @@ def get_parse_status(db: Session, user: User) -> dict:
     }
 
 
+def _ranked_tenants(db: Session, now: datetime, job_class: JobClass) -> List[int]:
+    """
+    Юзеры с pending задачами класса job_class в порядке fair-share очереди.
+
+    Виртуальное время юзера — сколько задач он получил за окно
+    FAIR_SHARE_WINDOW_MINUTES (плюс running), делённое на вес тарифа.
+    Ожидание головной задачи вычитается (aging), чтобы старые задачи
+    не голодали. Юзеры, упёршиеся в max_concurrent_jobs, пропускаются —
+    кроме экспресс-полосы INTERACTIVE, на которую лимит не действует.
+    """
+    window_start = now - timedelta(minutes=FAIR_SHARE_WINDOW_MINUTES)
+
+    pending = (
+        select(
+            ParseJob.user_id,
+            func.min(ParseJob.created_at).label("head_created_at"),
+        )
+        .where(
+            ParseJob.status == JobStatus.PENDING,
+            ParseJob.job_class == job_class,
+        )
+        .group_by(ParseJob.user_id)
+        .subquery()
+    )
+    served = (
+        select(
+            ParseJob.user_id,
+            func.count().filter(ParseJob.status == JobStatus.RUNNING).label("running"),
+            func.count().label("served"),
+        )
+        .where(or_(
+            ParseJob.status == JobStatus.RUNNING,
+            ParseJob.started_at >= window_start,
+        ))
+        .group_by(ParseJob.user_id)
+        .subquery()
+    )
+
+    head_wait = func.extract("epoch", literal(now) - pending.c.head_created_at)
+    virtual_time = (
+        cast(func.coalesce(served.c.served, 0), Float) / tariff_case("weight")
+        - head_wait / QUEUE_AGING_SECONDS
+    )
+
+    query = (
+        select(pending.c.user_id)
+        .join(User, User.id == pending.c.user_id)
+        .outerjoin(served, served.c.user_id == pending.c.user_id)
+        .order_by(virtual_time.asc(), pending.c.head_created_at.asc())
+        .limit(FAIR_SHARE_CANDIDATES)
+    )
+    if job_class != JobClass.INTERACTIVE:
+        query = query.where(func.coalesce(served.c.running, 0) < tariff_case("max_concurrent_jobs"))
+
+    rows = db.execute(query).all()
+    return [user_id for (user_id,) in rows]
+
+
 def get_next_pending_job(db: Session) -> Optional[ParseJob]:
-    """Взять следующую задачу из очереди (для worker)"""
-    job = db.query(ParseJob).filter(
-        ParseJob.status == JobStatus.PENDING,
-    ).order_by(
-        ParseJob.priority.desc(),
-        ParseJob.created_at.asc(),
-    ).with_for_update(skip_locked=True).first()
-
-    if job:
-        job.status = JobStatus.RUNNING
-        job.started_at = datetime.utcnow()
-        db.commit()
-        db.refresh(job)
-
-    return job
-
-
-def complete_job(db: Session, job: ParseJob, views: int, likes: int, comments: int, shares: int):
-    """Завершить задачу с результатом"""
-    job.status = JobStatus.COMPLETED
-    job.completed_at = datetime.utcnow()
-    job.result_views = views
-    job.result_likes = likes
-    job.result_comments = comments
-    job.result_shares = shares
+    """
+    Взять следующую задачу из очереди (для worker).
+
+    Полосы обслуживаются строго по JOB_CLASS_ORDER: пока есть INTERACTIVE,
+    плановые и backfill задачи ждут. Внутри полосы — fair-share между юзерами.
+    """
+    now = datetime.utcnow()
+
+    pending_classes = {
+        job_class for (job_class,) in db.query(ParseJob.job_class).filter(
+            ParseJob.status == JobStatus.PENDING,
+        ).distinct()
+    }
+
+    for job_class in JOB_CLASS_ORDER:
+        if job_class not in pending_classes:
+            continue
+
+        for user_id in _ranked_tenants(db, now, job_class):
+            job = db.query(ParseJob).filter(
+                ParseJob.user_id == user_id,
+                ParseJob.status == JobStatus.PENDING,
+                ParseJob.job_class == job_class,
+            ).order_by(
+                ParseJob.priority.desc(),
+                ParseJob.created_at.asc(),
+            ).with_for_update(skip_locked=True).first()
+
+            if job:
+                job.status = JobStatus.RUNNING
+                job.started_at = now
+                notify_events(db, [{
+                    "type": "job",
+                    "status": "running",
+                    "user_id": job.user_id,
+                    "reel_id": job.reel_id,
+                    "job_id": job.id,
+                    "at": now.isoformat(),
+                }])
+                db.commit()
+                db.refresh(job)
+                return job
+
+    return None
+
+
+def get_queue_lag(db: Session, user_id: Optional[int] = None) -> List[dict]:
+    """
+    Лаг очереди по юзерам: сколько ждёт самая старая pending задача и
+    среднее ожидание задач, взятых в работу за окно FAIR_SHARE_WINDOW_MINUTES.
+    """
+    now = datetime.utcnow()
+    window_start = now - timedelta(minutes=FAIR_SHARE_WINDOW_MINUTES)
+
+    oldest_pending = func.min(ParseJob.created_at).filter(ParseJob.status == JobStatus.PENDING)
+    avg_wait = func.avg(
+        func.extract("epoch", ParseJob.started_at - ParseJob.created_at)
+    ).filter(ParseJob.started_at >= window_start)
+
+    query = (
+        db.query(
+            ParseJob.user_id,
+            User.tariff,
+            func.count().filter(ParseJob.status == JobStatus.PENDING).label("pending"),
+            oldest_pending.label("oldest_pending"),
+            avg_wait.label("avg_wait"),
+        )
+        .join(User, User.id == ParseJob.user_id)
+        .filter(or_(
+            ParseJob.status == JobStatus.PENDING,
+            ParseJob.started_at >= window_start,
+        ))
+        .group_by(ParseJob.user_id, User.tariff)
+    )
+    if user_id is not None:
+        query = query.filter(ParseJob.user_id == user_id)
+
+    return [
+        {
+            "user_id": row.user_id,
+            "tariff": row.tariff.value,
+            "pending": row.pending,
+            "lag_seconds": round((now - row.oldest_pending).total_seconds(), 1) if row.oldest_pending else 0.0,
+            "avg_wait_seconds": round(float(row.avg_wait), 1) if row.avg_wait is not None else None,
+        }
+        for row in query.all()
+    ]
+
+
+def get_interactive_latency(db: Session, user_id: Optional[int] = None) -> dict:
+    """
+    Time-to-first-metric: от постановки INTERACTIVE задачи до результата
+    (p50/p95 за окно FAIR_SHARE_WINDOW_MINUTES, в секундах).
+    """
+    window_start = datetime.utcnow() - timedelta(minutes=FAIR_SHARE_WINDOW_MINUTES)
+    latency = func.extract("epoch", ParseJob.completed_at - ParseJob.created_at)
+
+    query = db.query(
+        func.count().label("jobs"),
+        func.percentile_cont(0.5).within_group(latency).label("p50"),
+        func.percentile_cont(0.95).within_group(latency).label("p95"),
+    ).filter(
+        ParseJob.job_class == JobClass.INTERACTIVE,
+        ParseJob.status == JobStatus.COMPLETED,
+        ParseJob.completed_at >= window_start,
+    )
+    if user_id is not None:
+        query = query.filter(ParseJob.user_id == user_id)
+
+    row = query.one()
+    return {
+        "jobs": row.jobs,
+        "p50_seconds": round(float(row.p50), 1) if row.p50 is not None else None,
+        "p95_seconds": round(float(row.p95), 1) if row.p95 is not None else None,
+    }
+
+
+def get_queue_lag_by_tariff(db: Session) -> dict:
+    """Максимальный лаг очереди по тарифам (для логов и SLO)"""
+    result = {tariff.value: 0.0 for tariff in TARIFF_LIMITS}
+    for row in get_queue_lag(db):
+        result[row["tariff"]] = max(result[row["tariff"]], row["lag_seconds"])
+    return result
+
+
+def persist_job_results(db: Session, completed: List[dict], failed: List[dict]) -> None:
+    """
+    Записать пачку результатов воркера одной транзакцией.
+
+    completed — dict с job_id, started_at (аренда, под которой задача взята),
+    user_id, reel_id, метриками, observed, changed, parsed_at и новыми полями
+    расписания рилса; failed — dict с job_id, started_at, user_id, reel_id,
+    error_message, completed_at.
+
+    Сначала задачи закрываются UPDATE по VALUES только если они всё ещё
+    RUNNING под той же арендой: результат, опоздавший после requeue_expired_jobs
+    или повторного захвата другим воркером, отбрасывается целиком — без
+    истории и дельт. Затем рилсы обновляются одним UPDATE ... FROM (VALUES ...),
+    изменившиеся метрики — одним многострочным INSERT в историю, у неизменных
+    последней точке истории продлевается last_confirmed_at. В той же
+    транзакции публикуются push-события (metrics / job) — клиенты получат
+    их только после commit.
+    """
+    now = datetime.utcnow()
+    events = []
+
+    if completed:
+        job_values = values(
+            column("id", Integer),
+            column("started_at", DateTime),
+            column("completed_at", DateTime),
+            column("views", Integer),
+            column("likes", Integer),
+            column("comments", Integer),
+            column("shares", Integer),
+            name="j",
+        ).data([
+            (r["job_id"], r["started_at"], r["parsed_at"], r["views"], r["likes"], r["comments"], r["shares"])
+            for r in completed
+        ])
+        owned = set(db.execute(
+            update(ParseJob)
+            .where(
+                ParseJob.id == job_values.c.id,
+                ParseJob.status == JobStatus.RUNNING,
+                ParseJob.started_at == job_values.c.started_at,
+            )
+            .values(
+                status=JobStatus.COMPLETED,
+                completed_at=job_values.c.completed_at,
+                result_views=job_values.c.views,
+                result_likes=job_values.c.likes,
+                result_comments=job_values.c.comments,
+                result_shares=job_values.c.shares,
+            )
+            .returning(ParseJob.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        stale = [r["job_id"] for r in completed if r["job_id"] not in owned]
+        if stale:
+            logger.warning(f"⚠️ Результаты задач с истёкшей арендой отброшены: {stale}")
+        completed = [r for r in completed if r["job_id"] in owned]
+
+    if completed:
+        reel_values = values(
+            column("id", Integer),
+            column("views", Integer),
+            column("likes", Integer),
+            column("comments", Integer),
+            column("shares", Integer),
+            column("parsed_at", DateTime),
+            column("next_parse_at", DateTime),
+            column("next_full_parse_at", DateTime),
+            column("views_velocity", Float),
+            column("parse_interval_minutes", Float),
+            column("changed", Boolean),
+            name="v",
+        ).data([
+            (
+                r["reel_id"], r["views"], r["likes"], r["comments"], r["shares"],
+                r["parsed_at"], r["next_parse_at"], r["next_full_parse_at"],
+                r["views_velocity"], r["parse_interval_minutes"], r["changed"],
+            )
+            for r in completed
+        ])
+        # Суммы дашборда — до UPDATE, пока у рилсов старые метрики
+        apply_metric_deltas(db, reel_values)
+        db.execute(
+            update(Reel)
+            .where(Reel.id == reel_values.c.id)
+            .values(
+                views=reel_values.c.views,
+                likes=reel_values.c.likes,
+                comments=reel_values.c.comments,
+                shares=reel_values.c.shares,
+                last_parsed_at=reel_values.c.parsed_at,
+                next_parse_at=reel_values.c.next_parse_at,
+                next_full_parse_at=func.coalesce(
+                    cast(reel_values.c.next_full_parse_at, DateTime), Reel.next_full_parse_at,
+                ),
+                views_velocity=reel_values.c.views_velocity,
+                parse_interval_minutes=func.coalesce(
+                    cast(reel_values.c.parse_interval_minutes, Float), Reel.parse_interval_minutes,
+                ),
+                updated_at=case((reel_values.c.changed, now), else_=Reel.updated_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        changed = [r for r in completed if r["changed"]]
+        unchanged = [r for r in completed if not r["changed"]]
+        refresh_top_reels(db, list({r["user_id"] for r in changed}))
+
+        if changed:
+            db.execute(insert(ReelHistory), [
+                {
+                    "reel_id": r["reel_id"],
+                    "views": r["views"],
+                    "likes": r["likes"],
+                    "comments": r["comments"],
+                    "shares": r["shares"],
+                    "observed": r["observed"],
+                    "parsed_at": r["parsed_at"],
+                    "last_confirmed_at": r["parsed_at"],
+                }
+                for r in changed
+            ])
+
+        if unchanged:
+            confirm_values = values(
+                column("reel_id", Integer),
+                column("parsed_at", DateTime),
+                name="c",
+            ).data([(r["reel_id"], r["parsed_at"]) for r in unchanged])
+            prev = aliased(ReelHistory)
+            latest_point = (
+                select(func.max(prev.parsed_at))
+                .where(prev.reel_id == confirm_values.c.reel_id)
+                .correlate(confirm_values)
+                .scalar_subquery()
+            )
+            db.execute(
+                update(ReelHistory)
+                .where(
+                    ReelHistory.reel_id == confirm_values.c.reel_id,
+                    ReelHistory.parsed_at == latest_point,
+                )
+                .values(last_confirmed_at=confirm_values.c.parsed_at)
+                .execution_options(synchronize_session=False)
+            )
+
+        events += [
+            {
+                "type": "metrics",
+                "user_id": r["user_id"],
+                "reel_id": r["reel_id"],
+                "job_id": r["job_id"],
+                "views": r["views"],
+                "likes": r["likes"],
+                "comments": r["comments"],
+                "shares": r["shares"],
+                "changed": r["changed"],
+                "parsed_at": r["parsed_at"].isoformat(),
+                "at": now.isoformat(),
+            }
+            for r in completed
+        ]
+
+    if failed:
+        fail_values = values(
+            column("id", Integer),
+            column("started_at", DateTime),
+            column("completed_at", DateTime),
+            column("error_message", Text),
+            name="f",
+        ).data([(r["job_id"], r["started_at"], r["completed_at"], r["error_message"]) for r in failed])
+        owned = set(db.execute(
+            update(ParseJob)
+            .where(
+                ParseJob.id == fail_values.c.id,
+                ParseJob.status == JobStatus.RUNNING,
+                ParseJob.started_at == fail_values.c.started_at,
+            )
+            .values(
+                status=JobStatus.FAILED,
+                completed_at=fail_values.c.completed_at,
+                error_message=fail_values.c.error_message,
+            )
+            .returning(ParseJob.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        failed = [r for r in failed if r["job_id"] in owned]
+
+        events += [
+            {
+                "type": "job",
+                "status": "failed",
+                "user_id": r["user_id"],
+                "reel_id": r["reel_id"],
+                "job_id": r["job_id"],
+                "error": (r["error_message"] or "")[:200],
+                "at": now.isoformat(),
+            }
+            for r in failed
+        ]
+
+    notify_events(db, events)
+    bump_data_version(db, [r["user_id"] for r in completed + failed])
+    db.commit()
+
+
+def requeue_expired_jobs(db: Session) -> int:
+    """
+    Вернуть в очередь RUNNING задачи с истёкшей арендой (JOB_LEASE_MINUTES
+    от взятия или последнего продления). Так результат, потерянный при
+    падении воркера до записи, будет перепарсен.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=JOB_LEASE_MINUTES)
+    count = db.query(ParseJob).filter(
+        ParseJob.status == JobStatus.RUNNING,
+        func.coalesce(ParseJob.heartbeat_at, ParseJob.started_at) < cutoff,
+    ).update(
+        {ParseJob.status: JobStatus.PENDING, ParseJob.started_at: None, ParseJob.heartbeat_at: None},
+        synchronize_session=False,
+    )
     db.commit()
+    return count
 
 
-def fail_job(db: Session, job: ParseJob, error_message: str):
-    """Пометить задачу как неудавшуюся"""
-    job.status = JobStatus.FAILED
-    job.completed_at = datetime.utcnow()
-    job.error_message = error_message
+def renew_job_leases(db: Session, job_ids: List[int]) -> None:
+    """Продлить аренду RUNNING задач, чьи результаты ещё ждут записи в буфере"""
+    if not job_ids:
+        return
+    db.query(ParseJob).filter(
+        ParseJob.id.in_(job_ids),
+        ParseJob.status == JobStatus.RUNNING,
+    ).update({ParseJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
     db.commit()
@@ -0,0 +1,93 @@
+"""
+Кэш аутентифицированных юзеров (principal) в памяти процесса
+
+get_current_user после проверки JWT берёт юзера отсюда: снимок строки
+users вливается в сессию запроса через merge(load=False), без SELECT.
+Часто меняющиеся колонки в снимок не входят и дочитываются при обращении.
+Смена тарифа, is_active или настроек Telegram сбрасывает запись во всех
+API-процессах (событие через NOTIFY), короткий TTL страхует остальное.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models.user import User
+from app.services.event_service import broker, notify_events
+
+PRINCIPAL_TTL_SECONDS = 30
+PRINCIPAL_CACHE_SIZE = 10000
+
+# Меняются фоновыми задачами без сброса кэша — не кэшируются
+VOLATILE_COLUMNS = {"data_version", "parse_budget_factor"}
+
+
+class PrincipalCache:
+    """LRU с TTL: user_id → отсоединённый снимок User"""
+
+    def __init__(self, ttl: float = PRINCIPAL_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, user_id: int, snapshot: User):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+principals = PrincipalCache()
+
+
+def _snapshot(user: User) -> User:
+    """Отсоединённая копия без volatile-колонок (их merge оставит незагруженными)"""
+    snapshot = User(**{
+        attr.key: getattr(user, attr.key)
+        for attr in User.__mapper__.column_attrs
+        if attr.key not in VOLATILE_COLUMNS
+    })
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def get_principal(db: Session, user_id: int) -> Optional[User]:
+    """Юзер в сессии db: из кэша без запроса, при промахе — SELECT и запись в кэш"""
+    snapshot = principals.get(user_id)
+    if snapshot is not None:
+        return db.merge(snapshot, load=False)
+
+    user = db.get(User, user_id)
+    if user is not None:
+        principals.put(user_id, _snapshot(user))
+    return user
+
+
+def invalidate_principal(db: Session, user_id: int) -> None:
+    """Сбросить юзера из кэша здесь и, после commit db, в остальных API-процессах"""
+    principals.forget(user_id)
+    notify_events(db, [{"type": "principal", "user_id": user_id}])
+
+
+broker.add_listener("principal", lambda event: principals.forget(event["user_id"]))
@@ -2,32 +2,159 @@
 Сервис для работы с рилсами: CRUD + бизнес-логика
 """
 
+import base64
+import json
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, literal_column, tuple_
+from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from app.models.user import User
-from app.models.reel import Reel, ReelHistory
+from app.models.reel import Reel
 from app.schemas.reel import ReelCreate, ReelUpdate
 from app.services.tariff_service import can_add_reel
+from app.services.stats_service import refresh_user_stats
+from app.services.version_service import bump_data_version
+from app.services.import_service import canonical_url
+from app.services.history_service import (
+    get_history_range,
+    get_latest_points,
+    get_points_since,
+    get_history_range_many,
+    align_series,
+    downsample_lttb,
+    DOWNSAMPLE_SOURCE_LIMIT,
+)
 
+_EPOCH = datetime(1970, 1, 1)
 
-def get_user_reels(db: Session, user: User) -> List[Reel]:
-    """Получить все рилсы юзера с историей"""
-    return (
+# Сортировки списка рилсов: выражение и значение для курсора (NULL приводится к нулю).
+# Выражения совпадают с индексами ix_reels_user_sort_* (models.reel.REEL_SORT_INDEXES);
+# константы — литералами в тексте SQL: с параметром asyncpg (prepared statement)
+# планировщик не сопоставит выражение с индексом
+_ZERO = literal_column("0")
+_EPOCH_SQL = literal_column("'1970-01-01 00:00:00'::timestamp")
+REEL_SORTS = {
+    "created_at": (Reel.created_at, lambda r: r.created_at),
+    "views": (func.coalesce(Reel.views, _ZERO), lambda r: r.views or 0),
+    "likes": (func.coalesce(Reel.likes, _ZERO), lambda r: r.likes or 0),
+    "comments": (func.coalesce(Reel.comments, _ZERO), lambda r: r.comments or 0),
+    "shares": (func.coalesce(Reel.shares, _ZERO), lambda r: r.shares or 0),
+    "views_velocity": (Reel.views_velocity, lambda r: r.views_velocity),
+    "engagement_rate": (func.coalesce(Reel.engagement_rate, _ZERO), lambda r: r.engagement_rate or 0),
+    "last_parsed_at": (func.coalesce(Reel.last_parsed_at, _EPOCH_SQL), lambda r: r.last_parsed_at or _EPOCH),
+    "title": (Reel.title, lambda r: r.title),
+}
+_DATETIME_SORTS = {"created_at", "last_parsed_at"}
+
+# Сравнение: не больше стольких рилсов за запрос
+COMPARE_MAX_REELS = 50
+COMPARE_METRICS = ("views", "likes", "comments", "shares")
+
+# Перекрытие курсора синхронизации: покрывает задержку записи результатов
+# и расхождение часов между процессами; повторы клиент применяет идемпотентно
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def _encode_cursor(sort: str, value, reel_id: int) -> str:
+    if sort in _DATETIME_SORTS:
+        value = value.isoformat()
+    raw = json.dumps([value, reel_id], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(sort: str, cursor: str) -> tuple:
+    try:
+        value, reel_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort in _DATETIME_SORTS:
+            value = datetime.fromisoformat(value)
+        return value, int(reel_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор",
+        )
+
+
+def list_user_reels(
+    db: Session,
+    user: User,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    platform: Optional[str] = None,
+    enabled: Optional[bool] = None,
+) -> dict:
+    """
+    Страница рилсов юзера без истории (keyset-пагинация по (sort, id)).
+    next_cursor передаётся в следующий запрос с теми же sort/order/фильтрами.
+    """
+    sort_expr, sort_value = REEL_SORTS[sort]
+    query = db.query(Reel).filter(Reel.user_id == user.id)
+    if platform is not None:
+        query = query.filter(Reel.platform == platform)
+    if enabled is not None:
+        query = query.filter(Reel.enabled == enabled)
+
+    key = tuple_(sort_expr, Reel.id)
+    if cursor:
+        after = tuple_(*_decode_cursor(sort, cursor))
+        query = query.filter(key < after if order == "desc" else key > after)
+
+    if order == "desc":
+        query = query.order_by(sort_expr.desc(), Reel.id.desc())
+    else:
+        query = query.order_by(sort_expr.asc(), Reel.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(sort, sort_value(rows[-1]), rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def sync_user_reels(db: Session, user: User, since: Optional[str] = None) -> dict:
+    """
+    Изменения с курсора since: рилсы с новыми метриками/настройками и их
+    точки истории, появившиеся или подтверждённые после курсора.
+    Без since — только новый курсор (клиент грузит список и синхронизируется с него).
+    reel_count — для обнаружения удалений: при расхождении клиент перезагружает список.
+    """
+    cursor = datetime.utcnow()
+    reel_count = db.query(func.count(Reel.id)).filter(Reel.user_id == user.id).scalar()
+    if since is None:
+        return {"reels": [], "history": [], "cursor": cursor.isoformat(), "reel_count": reel_count}
+
+    try:
+        after = datetime.fromisoformat(since) - SYNC_OVERLAP
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор",
+        )
+
+    reels = (
         db.query(Reel)
-        .options(joinedload(Reel.history))
-        .filter(Reel.user_id == user.id)
-        .order_by(Reel.created_at.desc())
+        .filter(Reel.user_id == user.id, Reel.updated_at > after)
+        .order_by(Reel.id)
         .all()
     )
+    points = get_points_since(db, [r.id for r in reels], after) if reels else {}
+    return {
+        "reels": reels,
+        "history": [{"reel_id": reel_id, "points": p} for reel_id, p in points.items()],
+        "cursor": cursor.isoformat(),
+        "reel_count": reel_count,
+    }
 
 
 def get_reel_by_id(db: Session, reel_id: int, user: User) -> Reel:
     """Получить рилс по ID (с проверкой владельца)"""
     reel = (
         db.query(Reel)
-        .options(joinedload(Reel.history))
         .filter(Reel.id == reel_id, Reel.user_id == user.id)
         .first()
     )
@@ -49,10 +176,11 @@ def create_reel(db: Session, user: User, data: ReelCreate) -> Reel:
             detail="Достигнут лимит рилсов на вашем тарифе. Обновите до Pro.",
         )
 
-    # Проверка дубликата URL для этого юзера
+    # Проверка дубликата URL для этого юзера (в каноническом виде, как при импорте)
+    url = canonical_url(data.url)
     existing = db.query(Reel).filter(
         Reel.user_id == user.id,
-        Reel.url == data.url,
+        Reel.url == url,
     ).first()
     if existing:
         raise HTTPException(
@@ -64,9 +192,12 @@ def create_reel(db: Session, user: User, data: ReelCreate) -> Reel:
         user_id=user.id,
         title=data.title,
         platform=data.platform,
-        url=data.url,
+        url=url,
     )
     db.add(reel)
+    db.flush()
+    refresh_user_stats(db, [user.id])
+    bump_data_version(db, [user.id])
     db.commit()
     db.refresh(reel)
     return reel
@@ -80,6 +211,10 @@ def update_reel(db: Session, reel_id: int, user: User, data: ReelUpdate) -> Reel
         reel.title = data.title
     if data.enabled is not None:
         reel.enabled = data.enabled
+    reel.updated_at = datetime.utcnow()
+    db.flush()
+    refresh_user_stats(db, [user.id])
+    bump_data_version(db, [user.id])
 
     db.commit()
     db.refresh(reel)
@@ -90,19 +225,106 @@ def delete_reel(db: Session, reel_id: int, user: User) -> bool:
     """Удалить рилс (с каскадом истории и задач)"""
     reel = get_reel_by_id(db, reel_id, user)
     db.delete(reel)
+    db.flush()
+    refresh_user_stats(db, [user.id])
+    bump_data_version(db, [user.id])
     db.commit()
     return True
 
 
-def get_reel_history(db: Session, reel_id: int, user: User, limit: int = 50) -> List[ReelHistory]:
-    """Получить историю метрик рилса"""
+def get_reel_history(
+    db: Session,
+    reel_id: int,
+    user: User,
+    limit: int = 50,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: Optional[int] = None,
+) -> List:
+    """
+    Получить историю метрик рилса.
+    Без диапазона — последние limit сырых точек (новые первыми),
+    с диапазоном — последние limit точек по возрастанию в разрешении под его длину.
+    max_points — прореживание LTTB (диапазон по умолчанию — вся жизнь рилса).
+    """
     # Проверяем, что рилс принадлежит юзеру
     reel = get_reel_by_id(db, reel_id, user)
 
-    return (
-        db.query(ReelHistory)
-        .filter(ReelHistory.reel_id == reel.id)
-        .order_by(ReelHistory.parsed_at.desc())
-        .limit(limit)
-        .all()
+    if max_points is not None:
+        # Раньше дня создания точек нет — диапазон не шире жизни рилса
+        start = start or reel.created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+        points = get_history_range(db, reel.id, user, start, end, DOWNSAMPLE_SOURCE_LIMIT)
+        return downsample_lttb(points, max_points)
+
+    if start is not None or end is not None:
+        return get_history_range(db, reel.id, user, start, end, limit)
+
+    return get_latest_points(db, reel.id, limit)
+
+
+def compare_reels(
+    db: Session,
+    user: User,
+    reel_ids: List[int],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    metrics: tuple = ("views",),
+    points: int = 200,
+) -> dict:
+    """
+    Ряды нескольких рилсов на общей сетке из points моментов — для графиков
+    сравнения. Владелец проверяется одним запросом по всем ID, история
+    читается запросом на источник, а не на рилс.
+    """
+    reel_ids = list(dict.fromkeys(reel_ids))
+    metrics = tuple(dict.fromkeys(metrics))
+    if not metrics or not set(metrics) <= set(COMPARE_METRICS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Метрики: {', '.join(COMPARE_METRICS)}",
+        )
+    if len(reel_ids) > COMPARE_MAX_REELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Не больше {COMPARE_MAX_REELS} рилсов для сравнения",
+        )
+
+    reels = {
+        r.id: r
+        for r in db.query(Reel.id, Reel.title, Reel.created_at)
+        .filter(Reel.user_id == user.id, Reel.id.in_(reel_ids))
+    }
+    if len(reels) != len(reel_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рилс не найден",
+        )
+
+    start, end = (
+        dt.astimezone(timezone.utc).replace(tzinfo=None) if dt is not None and dt.tzinfo else dt
+        for dt in (start, end)
     )
+    end = end or datetime.utcnow()
+    # Раньше дня создания самого старого рилса точек нет
+    start = start or min(r.created_at for r in reels.values()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Пустой диапазон",
+        )
+
+    resolution, history = get_history_range_many(db, reel_ids, user, start, end)
+    step = (end - start) / (points - 1)
+    grid = [start + step * i for i in range(points)]
+    return {
+        "resolution": resolution,
+        "t": grid,
+        "series": [
+            {
+                "reel_id": reel_id,
+                "title": reels[reel_id].title,
+                "values": align_series(history[reel_id], grid, metrics),
+            }
+            for reel_id in reel_ids
+        ],
+    }
@@ -0,0 +1,145 @@
+"""
+Сервис расписания: фазы рилсов внутри интервала тарифа
+
+Каждый рилс получает детерминированную фазу (доля интервала по reel_id,
+золотое сечение — равномерное распределение для любых id) и парсится
+в моменты phase + k * interval плюс небольшой джиттер. Так очередь и
+исходящий трафик на платформы ровные, без пиков раз в интервал.
+
+В адаптивном режиме (ADAPTIVE_SCHEDULING) интервал рилса зависит от
+скорости роста просмотров: быстрые рилсы парсятся чаще, застывшие —
+реже, в пределах бюджета парсингов тарифа.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, cast, literal, select, update, Numeric
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.user import User
+from app.models.reel import Reel
+from app.services.tariff_service import TARIFF_LIMITS, get_parse_interval, tariff_case
+
+settings = get_settings()
+
+# Дробная часть reel_id * GOLDEN_RATIO — фаза рилса
+GOLDEN_RATIO = 0.6180339887498949
+
+# Джиттер: до 5% интервала сверх слота фазы
+JITTER_FRACTION = 0.05
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Сглаживание скорости роста: вес нового замера
+VELOCITY_ALPHA = 0.5
+
+
+def reel_phase(reel_id: int) -> float:
+    """Фаза рилса в долях интервала [0, 1)"""
+    return (reel_id * GOLDEN_RATIO) % 1.0
+
+
+def next_parse_time(reel_id: int, interval_minutes: float, now: datetime) -> datetime:
+    """Ближайший после now слот фазы рилса (+ джиттер)"""
+    interval_s = interval_minutes * 60
+    now_s = (now - _EPOCH).total_seconds()
+    phase_s = reel_phase(reel_id) * interval_s
+
+    delay = interval_s - (now_s - phase_s) % interval_s
+    jitter = random.uniform(0, JITTER_FRACTION * interval_s)
+    return now + timedelta(seconds=delay + jitter)
+
+
+def next_parse_time_sql(reel_id_column, interval_minutes, now: datetime):
+    """
+    SQL-версия next_parse_time для set-based UPDATE шедулера;
+    interval_minutes — число или SQL-выражение (интервал конкретного рилса)
+    """
+    interval_s = cast(interval_minutes * 60, Numeric)
+    now_s = (now - _EPOCH).total_seconds()
+
+    phase_s = func.mod(cast(reel_id_column * GOLDEN_RATIO, Numeric), 1) * interval_s
+    delay = interval_s - func.mod(cast(literal(now_s) - phase_s, Numeric), interval_s)
+    jitter = func.random() * (JITTER_FRACTION * interval_s)
+
+    return literal(now) + func.make_interval(0, 0, 0, 0, 0, 0, delay + jitter)
+
+
+def update_velocity(
+    prev_views: int,
+    prev_parsed_at: Optional[datetime],
+    prev_velocity: float,
+    views: int,
+    now: datetime,
+) -> float:
+    """Новая EWMA-скорость роста (просмотров/час) по двум соседним точкам истории"""
+    if prev_parsed_at is None:
+        return prev_velocity or 0.0
+    hours = (now - prev_parsed_at).total_seconds() / 3600
+    if hours <= 0:
+        return prev_velocity or 0.0
+
+    instant = max(0, views - (prev_views or 0)) / hours
+    return VELOCITY_ALPHA * instant + (1 - VELOCITY_ALPHA) * (prev_velocity or 0.0)
+
+
+def adaptive_interval(user: User, views: int, velocity: float) -> float:
+    """
+    Интервал (минуты), за который просмотры вырастут примерно на
+    ADAPTIVE_TARGET_GROWTH, в пределах [интервал тарифа, потолок тарифа].
+    """
+    floor = get_parse_interval(user)
+    ceiling = TARIFF_LIMITS[user.tariff]["max_parse_interval_minutes"]
+    if velocity <= 0:
+        return ceiling
+
+    growth_per_hour = velocity / max(views, 1)
+    minutes = settings.ADAPTIVE_TARGET_GROWTH / growth_per_hour * 60
+    return min(ceiling, max(floor, minutes))
+
+
+def reel_parse_interval(parse_interval_minutes: Optional[float], user: User) -> float:
+    """
+    Фактический интервал парсинга рилса (reels.parse_interval_minutes)
+    с учётом адаптивного режима и бюджета юзера
+    """
+    if not settings.ADAPTIVE_SCHEDULING or parse_interval_minutes is None:
+        return get_parse_interval(user)
+    return parse_interval_minutes * (user.parse_budget_factor or 1.0)
+
+
+def reel_parse_interval_sql(tariff_interval_minutes: float):
+    """SQL-версия reel_parse_interval по колонкам reels и users (запрос должен включать обе)"""
+    if not settings.ADAPTIVE_SCHEDULING:
+        return literal(tariff_interval_minutes)
+    return func.coalesce(
+        Reel.parse_interval_minutes * func.coalesce(User.parse_budget_factor, 1.0),
+        tariff_interval_minutes,
+    )
+
+
+def update_parse_budgets(db: Session) -> None:
+    """
+    Пересчитать users.parse_budget_factor одним UPDATE: если суммарная
+    частота адаптивных интервалов юзера превышает parse_budget_per_hour
+    тарифа, все его интервалы растягиваются пропорционально.
+    """
+    demand = (
+        select(
+            Reel.user_id,
+            func.sum(60.0 / Reel.parse_interval_minutes).label("per_hour"),
+        )
+        .where(Reel.enabled == True, Reel.parse_interval_minutes > 0)
+        .group_by(Reel.user_id)
+        .subquery()
+    )
+    db.execute(
+        update(User)
+        .where(User.id == demand.c.user_id)
+        .values(parse_budget_factor=func.greatest(1.0, demand.c.per_hour / tariff_case("parse_budget_per_hour")))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
@@ -0,0 +1,196 @@
+"""
+Сервис агрегатов дашборда (user_stats)
+
+Суммы метрик обновляются инкрементально в транзакции result writer'а
+(разница новых и старых метрик рилсов), топ рилсов — пересчётом по
+затронутым юзерам, прирост за 24ч/7д — history-тиком по rollups.
+Создание/удаление/правка рилса пересчитывает агрегаты юзера целиком.
+"""
+
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import func, select, update, cast, literal, literal_column, true, BigInteger, DateTime
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert, aggregate_order_by
+
+from app.models.user import User
+from app.models.reel import Reel
+from app.models.history import ReelHistoryHourly, ReelHistoryDaily
+from app.models.stats import UserStats
+from app.services.version_service import bump_data_version
+
+# Сколько рилсов в топе дашборда
+TOP_REELS = 5
+
+METRICS = ("views", "likes", "comments", "shares")
+
+
+def refresh_user_stats(db: Session, user_ids: List[int]) -> None:
+    """
+    Пересчитать суммы и топ юзеров с нуля (upsert), без commit.
+    Строки user_stats блокируются до агрегации: иначе дельта result writer'а,
+    закоммиченная между чтением reels и upsert, затиралась бы старой суммой.
+    """
+    if not user_ids:
+        return
+
+    # Ждём незавершённые apply_metric_deltas; агрегат ниже увидит их UPDATE reels,
+    # а более поздние дельты прибавятся уже к пересчитанной сумме
+    (
+        db.query(UserStats.user_id)
+        .filter(UserStats.user_id.in_(user_ids))
+        .order_by(UserStats.user_id)
+        .with_for_update()
+        .all()
+    )
+
+    totals = (
+        select(
+            User.id,
+            func.count(Reel.id),
+            *[cast(func.coalesce(func.sum(getattr(Reel, name)), 0), BigInteger) for name in METRICS],
+            literal_column("'[]'::json"),
+            literal(datetime.utcnow(), DateTime),
+        )
+        .select_from(User)
+        .outerjoin(Reel, Reel.user_id == User.id)
+        .where(User.id.in_(user_ids))
+        .group_by(User.id)
+    )
+    target = ["user_id", "total_reels"] + [f"total_{name}" for name in METRICS] + ["top_reels", "updated_at"]
+    stmt = pg_insert(UserStats).from_select(target, totals)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={name: getattr(stmt.excluded, name) for name in target[1:]},
+    ))
+    refresh_top_reels(db, user_ids)
+
+
+def apply_metric_deltas(db: Session, reel_values) -> None:
+    """
+    Прибавить к суммам юзеров разницу новых и текущих метрик рилсов.
+    reel_values — VALUES result writer'а (id, метрики, changed); вызывать
+    до UPDATE reels, пока в таблице старые значения.
+    """
+    deltas = (
+        select(
+            Reel.user_id,
+            *[
+                cast(func.sum(reel_values.c[name] - func.coalesce(getattr(Reel, name), 0)), BigInteger).label(name)
+                for name in METRICS
+            ],
+        )
+        .where(Reel.id == reel_values.c.id, reel_values.c.changed)
+        .group_by(Reel.user_id)
+        .subquery()
+    )
+    db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == deltas.c.user_id)
+        .values(
+            updated_at=datetime.utcnow(),
+            **{f"total_{name}": getattr(UserStats, f"total_{name}") + deltas.c[name] for name in METRICS},
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_top_reels(db: Session, user_ids: List[int]) -> None:
+    """Пересчитать топ рилсов по просмотрам у перечисленных юзеров"""
+    if not user_ids:
+        return
+
+    # LATERAL с LIMIT на юзера: обратный проход по ix_reels_user_sort_views,
+    # без сортировки всех рилсов юзера
+    users = select(User.id.label("user_id")).where(User.id.in_(user_ids)).subquery()
+    views = func.coalesce(Reel.views, 0)
+    best = (
+        select(Reel.id, Reel.title, Reel.views, views.label("rank_views"))
+        .where(Reel.user_id == users.c.user_id)
+        .order_by(views.desc(), Reel.id.desc())
+        .limit(TOP_REELS)
+        .lateral()
+    )
+    top = (
+        select(
+            users.c.user_id,
+            func.json_agg(aggregate_order_by(
+                func.json_build_object("id", best.c.id, "title", best.c.title, "views", best.c.views),
+                best.c.rank_views.desc(),
+                best.c.id.desc(),
+            )).label("top_reels"),
+        )
+        .select_from(users.join(best, true()))
+        .group_by(users.c.user_id)
+        .subquery()
+    )
+    db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == top.c.user_id)
+        .values(top_reels=top.c.top_reels)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _views_delta(baseline_model, cutoff: datetime, lookback: timedelta):
+    """
+    Подзапрос (user_id, delta): текущие просмотры минус views_last последней
+    корзины до cutoff; у рилсов без неё — минус первая корзина после cutoff.
+    """
+    before = (
+        select(baseline_model.reel_id, baseline_model.views_last.label("views"))
+        .where(baseline_model.bucket_start < cutoff, baseline_model.bucket_start >= cutoff - lookback)
+        .order_by(baseline_model.reel_id, baseline_model.bucket_start.desc())
+        .distinct(baseline_model.reel_id)
+        .subquery()
+    )
+    after = (
+        select(ReelHistoryHourly.reel_id, ReelHistoryHourly.views_min.label("views"))
+        .where(ReelHistoryHourly.bucket_start >= cutoff)
+        .order_by(ReelHistoryHourly.reel_id, ReelHistoryHourly.bucket_start.asc())
+        .distinct(ReelHistoryHourly.reel_id)
+        .subquery()
+    )
+    baseline = func.coalesce(before.c.views, after.c.views, Reel.views, 0)
+    return (
+        select(
+            Reel.user_id,
+            cast(func.sum(func.coalesce(Reel.views, 0) - baseline), BigInteger).label("delta"),
+        )
+        .outerjoin(before, before.c.reel_id == Reel.id)
+        .outerjoin(after, after.c.reel_id == Reel.id)
+        .group_by(Reel.user_id)
+        .subquery()
+    )
+
+
+def update_growth_deltas(db: Session, now: datetime) -> None:
+    """Пересчитать прирост просмотров за 24ч (часовые корзины) и 7д (дневные) у всех юзеров"""
+    for column, model, period in (
+        ("views_delta_24h", ReelHistoryHourly, timedelta(hours=24)),
+        ("views_delta_7d", ReelHistoryDaily, timedelta(days=7)),
+    ):
+        deltas = _views_delta(model, now - period, period)
+        changed = db.execute(
+            update(UserStats)
+            .where(
+                UserStats.user_id == deltas.c.user_id,
+                getattr(UserStats, column).is_distinct_from(deltas.c.delta),
+            )
+            .values({column: deltas.c.delta})
+            .returning(UserStats.user_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        bump_data_version(db, changed)
+    db.commit()
+
+
+def get_user_stats(db: Session, user: User) -> UserStats:
+    """Агрегаты юзера; при первом обращении строка создаётся пересчётом"""
+    stats = db.get(UserStats, user.id)
+    if stats is None:
+        refresh_user_stats(db, [user.id])
+        db.commit()
+        stats = db.get(UserStats, user.id)
+    return stats
@@ -2,10 +2,13 @@
 Сервис тарифных планов: лимиты, проверки
 """
 
+from sqlalchemy import case
 from sqlalchemy.orm import Session
 from app.models.user import User, TariffType
 from app.models.reel import Reel
 from app.config import get_settings
+from app.services.principal_service import invalidate_principal
+from app.services.stats_service import get_user_stats
 
 settings = get_settings()
 
@@ -14,12 +17,26 @@ TARIFF_LIMITS = {
         "max_reels": settings.FREE_MAX_REELS,
         "parse_interval_minutes": settings.FREE_PARSE_INTERVAL_MINUTES,
         "priority": 0,
+        "weight": 1,  # доля воркеров в fair-share очереди
+        "max_concurrent_jobs": 1,
+        # Адаптивное расписание: потолок интервала и бюджет парсингов в час
+        "max_parse_interval_minutes": 24 * 60,
+        "parse_budget_per_hour": 60,
+        # Ретенция истории: сырые точки и часовые корзины (дневные хранятся всегда)
+        "raw_history_days": 7,
+        "hourly_history_days": 90,
         "label": "Free",
     },
     TariffType.PRO: {
         "max_reels": 999999,  # безлимит
         "parse_interval_minutes": settings.PRO_PARSE_INTERVAL_MINUTES,
         "priority": 10,
+        "weight": 4,
+        "max_concurrent_jobs": 4,
+        "max_parse_interval_minutes": 6 * 60,
+        "parse_budget_per_hour": 6000,
+        "raw_history_days": 30,
+        "hourly_history_days": 365,
         "label": "Pro",
     },
 }
@@ -28,7 +45,7 @@ TARIFF_LIMITS = {
 def get_tariff_info(user: User, db: Session) -> dict:
     """Получить информацию о тарифе пользователя"""
     limits = TARIFF_LIMITS[user.tariff]
-    reels_count = db.query(Reel).filter(Reel.user_id == user.id).count()
+    reels_count = get_user_stats(db, user).total_reels
 
     return {
         "tariff": user.tariff.value,
@@ -58,9 +75,19 @@ def get_priority(user: User) -> int:
     return TARIFF_LIMITS[user.tariff]["priority"]
 
 
+def tariff_case(key: str):
+    """SQL CASE по users.tariff со значением лимита key из TARIFF_LIMITS"""
+    return case(
+        {tariff: limits[key] for tariff, limits in TARIFF_LIMITS.items()},
+        value=User.tariff,
+    )
+
+
 def upgrade_to_pro(user: User, db: Session) -> User:
     """Апгрейд на Pro (MVP: без оплаты)"""
     user.tariff = TariffType.PRO
+    user.data_version = User.data_version + 1
+    invalidate_principal(db, user.id)
     db.commit()
     db.refresh(user)
     return user
@@ -8,6 +8,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from app.models.user import User
+from app.services.principal_service import invalidate_principal
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +86,7 @@ def update_telegram_settings(db: Session, user: User, settings: dict) -> User:
         if value is not None and key in field_mapping:
             setattr(user, field_mapping[key], value)
 
+    invalidate_principal(db, user.id)
     db.commit()
     db.refresh(user)
     return user
@@ -0,0 +1,27 @@
+"""
+Версия данных юзера: users.data_version растёт при записи, видимой в его
+ответах API: результаты парсинга, правки и удаление рилсов, запуск парсинга
+юзером, тариф. По ней строятся ETag. Плановая постановка в очередь и захват
+задач воркером версию не меняют: строка users не становится горячей, а
+статус очереди перечитывается по временной соли своего ETag.
+"""
+
+from typing import Iterable
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+
+
+def bump_data_version(db: Session, user_ids: Iterable[int]) -> None:
+    """+1 к data_version юзеров (без commit); id по возрастанию — один порядок блокировок"""
+    ids = sorted(set(user_ids))
+    if not ids:
+        return
+    db.execute(
+        update(User)
+        .where(User.id.in_(ids))
+        .values(data_version=User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
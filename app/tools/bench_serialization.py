@@ -0,0 +1,110 @@
+"""
+Бенчмарк сериализации истории рилса (без БД)
+
+Сравнивает путь FastAPI по умолчанию (валидация pydantic + json) с orjson
+по строкам и по колонкам: p50/p99 времени кодирования и размер ответа
+без сжатия, gzip и brotli.
+
+    python -m app.tools.bench_serialization --points 50000 --runs 30
+"""
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.core.compression import brotli
+from app.schemas.reel import ReelHistoryResponse
+from app.services.history_service import history_columns
+
+
+def synthetic_points(count: int, seed: int = 42) -> List[dict]:
+    """Ряд точек как из history_service: растущие метрики, шаг 5–30 минут"""
+    rng = random.Random(seed)
+    at = datetime(2026, 1, 1)
+    views = likes = comments = shares = 0
+    points = []
+    for i in range(count):
+        views += rng.randint(0, 500)
+        likes += rng.randint(0, 40)
+        comments += rng.randint(0, 5)
+        shares += rng.randint(0, 3)
+        confirmed = at + timedelta(minutes=rng.randint(0, 10))
+        points.append({
+            "id": i + 1,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "observed": 15 if i % 4 == 0 else 1,
+            "parsed_at": at,
+            "last_confirmed_at": confirmed,
+        })
+        at = confirmed + timedelta(minutes=rng.randint(5, 30))
+    return points
+
+
+def _pydantic_json(points: List[dict]) -> bytes:
+    """Как FastAPI с response_model: валидация, dump в json-режиме, json.dumps"""
+    adapter = TypeAdapter(List[ReelHistoryResponse])
+    content = adapter.dump_python(adapter.validate_python(points), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+VARIANTS = {
+    "pydantic+json rows": _pydantic_json,
+    "orjson rows": orjson.dumps,
+    "orjson columns": lambda points: orjson.dumps(history_columns(points)),
+}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(points_count: int, runs: int) -> List[dict]:
+    points = synthetic_points(points_count)
+    results = []
+    for name, encode in VARIANTS.items():
+        encode(points)  # прогрев
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            body = encode(points)
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append({
+            "variant": name,
+            "p50_ms": statistics.median(timings),
+            "p99_ms": _percentile(timings, 0.99),
+            "bytes": len(body),
+            "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+            "br_bytes": len(brotli.compress(body, quality=4)) if brotli is not None else None,
+        })
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации истории")
+    parser.add_argument("--points", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    print(f"{args.points} точек, {args.runs} прогонов")
+    print(f"{'вариант':<22}{'p50, мс':>10}{'p99, мс':>10}{'байт':>12}{'gzip':>10}{'br':>10}")
+    for r in run(args.points, args.runs):
+        br = r["br_bytes"] if r["br_bytes"] is not None else "—"
+        print(f"{r['variant']:<22}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['bytes']:>12}{r['gzip_bytes']:>10}{br:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Нагрузочный тест читающих эндпоинтов: пропускная способность и задержки
+при заданной параллельности
+
+Медленную БД удобно эмулировать задержкой сети до Postgres, например
+toxiproxy (latency 50ms) между API и базой. Один и тот же прогон на сборке
+до и после перевода эндпоинтов на async показывает, упирается ли
+параллельность в размер threadpool (40 потоков по умолчанию):
+
+    python -m app.tools.load_test --url http://localhost:8000/api/reels \\
+        --token <access token> --concurrency 200 --requests 4000
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+import httpx
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(url: str, token: str, concurrency: int, total: int, timeout: float) -> dict:
+    """total GET-запросов к url не более чем concurrency одновременно"""
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+        "p95_ms": _percentile(latencies, 0.95) if latencies else None,
+        "p99_ms": _percentile(latencies, 0.99) if latencies else None,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--token", required=True, help="access token юзера")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.url, args.token, args.concurrency, args.requests, args.timeout))
+    print(f"{args.url}: параллельность {args.concurrency}, запросов {result['requests']}, ошибок {result['errors']}")
+    if result["p50_ms"] is not None:
+        print(
+            f"{result['rps']:.0f} rps, p50 {result['p50_ms']:.0f} мс, "
+            f"p95 {result['p95_ms']:.0f} мс, p99 {result['p99_ms']:.0f} мс"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
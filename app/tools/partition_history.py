@@ -0,0 +1,140 @@
+"""
+Перевод reel_history на секционированную таблицу без простоя
+
+Миграция 9e1b7c3a5d28 создаёт reel_history_new и триггер-зеркало.
+Дальше по шагам:
+
+    python -m app.tools.partition_history backfill     # перенос старых строк пачками
+    python -m app.tools.partition_history swap         # переключение таблиц (секунды)
+    python -m app.tools.partition_history drop-legacy  # после проверки
+"""
+
+import argparse
+import logging
+import sys
+from typing import Tuple
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 50000
+
+HISTORY_COLUMNS = "id, reel_id, views, likes, comments, shares, observed, parsed_at, last_confirmed_at, carried_from"
+
+
+def backfill(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Скопировать строки reel_history в reel_history_new диапазонами id, по транзакции на пачку"""
+    db = SessionLocal()
+    try:
+        low, high = db.execute(text("SELECT min(id), max(id) FROM reel_history")).one()
+        db.commit()
+        if low is None:
+            return 0
+
+        copied = 0
+        for start in range(low, high + 1, batch_size):
+            result = db.execute(text(
+                f"INSERT INTO reel_history_new ({HISTORY_COLUMNS}) "
+                f"SELECT {HISTORY_COLUMNS} FROM reel_history "
+                f"WHERE id >= :start AND id < :end "
+                f"ON CONFLICT DO NOTHING"
+            ), {"start": start, "end": start + batch_size})
+            db.commit()
+            copied += result.rowcount
+            logger.info(f"📦 id {start}..{min(start + batch_size, high + 1) - 1}: +{result.rowcount}")
+        return copied
+    finally:
+        db.close()
+
+
+def _compare_counts(db, condition: str, params: dict) -> Tuple[int, int]:
+    """Строки обеих таблиц по условию на id — одним запросом, в одном снимке"""
+    return db.execute(text(
+        f"SELECT (SELECT count(*) FROM reel_history WHERE {condition}), "
+        f"(SELECT count(*) FROM reel_history_new WHERE {condition})"
+    ), params).one()
+
+
+def swap() -> None:
+    """
+    Переключить таблицы одной транзакцией: старая становится
+    reel_history_legacy, секционированная — reel_history.
+
+    Полная сверка количества строк идёт до блокировки; под ACCESS
+    EXCLUSIVE перепроверяется только хвост id > сверенного максимума,
+    поэтому таблица заблокирована секунды, а не время полного скана.
+    """
+    db = SessionLocal()
+    try:
+        verified_max = db.execute(text("SELECT coalesce(max(id), 0) FROM reel_history")).scalar()
+        old_count, new_count = _compare_counts(db, "id <= :max", {"max": verified_max})
+        db.commit()
+        if old_count != new_count:
+            raise RuntimeError(f"Перенос не завершён: {old_count} строк в reel_history, {new_count} в новой")
+
+        db.execute(text("LOCK TABLE reel_history IN ACCESS EXCLUSIVE MODE"))
+
+        old_tail, new_tail = _compare_counts(db, "id > :max", {"max": verified_max})
+        if old_tail != new_tail:
+            raise RuntimeError(f"Хвост id > {verified_max} не совпадает: {old_tail} в reel_history, {new_tail} в новой")
+        new_count += new_tail
+
+        for statement in (
+            "DROP TRIGGER reel_history_mirror ON reel_history",
+            "DROP FUNCTION reel_history_mirror()",
+            "ALTER TABLE reel_history RENAME TO reel_history_legacy",
+            "ALTER TABLE reel_history_legacy RENAME CONSTRAINT reel_history_pkey TO reel_history_legacy_pkey",
+            "ALTER TABLE reel_history_legacy RENAME CONSTRAINT reel_history_reel_id_fkey TO reel_history_legacy_reel_id_fkey",
+            "ALTER INDEX IF EXISTS ix_reel_history_id RENAME TO ix_reel_history_legacy_id",
+            "ALTER INDEX IF EXISTS ix_reel_history_reel_parsed RENAME TO ix_reel_history_legacy_reel_parsed",
+            "ALTER TABLE reel_history_new RENAME TO reel_history",
+            "ALTER TABLE reel_history RENAME CONSTRAINT reel_history_new_pkey TO reel_history_pkey",
+            "ALTER TABLE reel_history RENAME CONSTRAINT reel_history_new_reel_id_fkey TO reel_history_reel_id_fkey",
+            "ALTER INDEX ix_reel_history_new_id RENAME TO ix_reel_history_id",
+            "ALTER INDEX ix_reel_history_new_reel_parsed RENAME TO ix_reel_history_reel_parsed",
+            "ALTER INDEX ix_reel_history_new_parsed_brin RENAME TO ix_reel_history_parsed_brin",
+            # Иначе DROP reel_history_legacy удалит и последовательность id
+            "ALTER SEQUENCE reel_history_id_seq OWNED BY reel_history.id",
+        ):
+            db.execute(text(statement))
+        db.commit()
+        logger.info(f"✅ reel_history секционирована ({new_count} строк)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def drop_legacy() -> None:
+    db = SessionLocal()
+    try:
+        db.execute(text("DROP TABLE IF EXISTS reel_history_legacy"))
+        db.commit()
+        logger.info("🧹 reel_history_legacy удалена")
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Секционирование reel_history")
+    parser.add_argument("command", choices=["backfill", "swap", "drop-legacy"])
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+    if args.command == "backfill":
+        logger.info(f"📦 Перенесено строк: {backfill(args.batch_size)}")
+    elif args.command == "swap":
+        swap()
+    else:
+        drop_legacy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
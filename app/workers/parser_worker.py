@@ -4,15 +4,22 @@ Worker парсинга — берёт задачи из очереди и вы
 
 import logging
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models.reel import Reel, ReelHistory
-from app.models.parsing import ParseJob, JobStatus
-from app.services.parsing_service import get_next_pending_job, complete_job, fail_job
+from app.models.reel import Reel, observed_mask
+from app.models.parsing import ParseJob, JobStatus, JobClass, JobType
+from app.services.parsing_service import get_next_pending_job, get_queue_lag_by_tariff
+from app.services.schedule_service import (
+    next_parse_time,
+    update_velocity,
+    adaptive_interval,
+    reel_parse_interval,
+)
 from app.services.telegram_service import get_user_telegram
-from app.core.reels_parser import ReelsParser
+from app.core.reels_parser import ReelsParser, METRIC_FIELDS
+from app.workers.result_writer import ResultWriter
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -89,9 +96,10 @@ async def send_telegram_notification(user, reel, metrics, old_views):
         logger.error(f"Ошибка отправки Telegram: {e}")
 
 
-def process_one_job(db: Session) -> bool:
+def process_one_job(db: Session, writer: ResultWriter) -> bool:
     """
     Обработать одну задачу из очереди.
+    Результат не пишется в БД сразу, а передаётся в ResultWriter.
     Возвращает True если задача была обработана, False если очередь пуста.
     """
     job = get_next_pending_job(db)
@@ -104,7 +112,7 @@ def process_one_job(db: Session) -> bool:
         # Получаем рилс и юзера
         reel = db.query(Reel).filter(Reel.id == job.reel_id).first()
         if not reel:
-            fail_job(db, job, "Рилс не найден")
+            writer.fail({"job_id": job.id, "started_at": job.started_at, "user_id": job.user_id, "reel_id": job.reel_id, "error_message": "Рилс не найден", "completed_at": datetime.utcnow()})
             return True
 
         # Запоминаем старые просмотры для сравнения
@@ -118,45 +126,67 @@ def process_one_job(db: Session) -> bool:
         if reel.platform == 'instagram' and not url.startswith('http'):
             url = f"https://www.instagram.com/reel/{url}/"
 
-        metrics = parser.parse_reel(url, reel.platform)
+        lite = job.job_type == JobType.LITE
+        metrics = parser.parse_reel(url, reel.platform, lite=lite)
 
         if metrics is None:
-            fail_job(db, job, "Не удалось получить метрики")
+            writer.fail({"job_id": job.id, "started_at": job.started_at, "user_id": job.user_id, "reel_id": job.reel_id, "error_message": "Не удалось получить метрики", "completed_at": datetime.utcnow()})
             return True
 
+        # Ненаблюдённые метрики (lite-парсинг) переносим из текущих значений рилса
+        observed = metrics.get('observed', METRIC_FIELDS)
+        for name in METRIC_FIELDS:
+            if name not in observed:
+                metrics[name] = getattr(reel, name) or 0
+
         views = metrics.get('views', 0)
         likes = metrics.get('likes', 0)
         comments = metrics.get('comments', 0)
         shares = metrics.get('shares', 0)
 
-        # Обновляем текущие метрики рилса
-        reel.views = views
-        reel.likes = likes
-        reel.comments = comments
-        reel.shares = shares
-        reel.last_parsed_at = datetime.utcnow()
-
-        # Сохраняем в историю
-        history_entry = ReelHistory(
-            reel_id=reel.id,
-            views=views,
-            likes=likes,
-            comments=comments,
-            shares=shares,
-            parsed_at=datetime.utcnow(),
+        now = datetime.utcnow()
+        user = reel.user
+
+        # Скорость роста и адаптивный интервал
+        velocity = update_velocity(old_views, reel.last_parsed_at, reel.views_velocity, views, now)
+        parse_interval_minutes = (
+            adaptive_interval(user, views, velocity) if settings.ADAPTIVE_SCHEDULING else None
         )
-        db.add(history_entry)
 
-        # Завершаем задачу
-        complete_job(db, job, views, likes, comments, shares)
+        # Следующий парсинг — в ближайший слот фазы рилса внутри его интервала
+        interval = reel_parse_interval(parse_interval_minutes or reel.parse_interval_minutes, user)
 
-        logger.info(f"✅ Задача #{job.id} завершена: views={views}, likes={likes}, comments={comments}, shares={shares}")
+        # Те же метрики, что в последней точке истории, — новую строку не пишем
+        changed = reel.last_parsed_at is None or (views, likes, comments, shares) != (
+            reel.views or 0, reel.likes or 0, reel.comments or 0, reel.shares or 0,
+        )
+
+        writer.complete({
+            "job_id": job.id,
+            "started_at": job.started_at,
+            "user_id": job.user_id,
+            "reel_id": reel.id,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "observed": observed_mask(observed),
+            "changed": changed,
+            "parsed_at": now,
+            "next_parse_at": next_parse_time(reel.id, interval, now),
+            "next_full_parse_at": None if lite else now + timedelta(minutes=interval * settings.FULL_REFRESH_EVERY),
+            "views_velocity": velocity,
+            "parse_interval_minutes": parse_interval_minutes,
+        })
+
+        logger.info(f"✅ Задача #{job.id} ({job.job_type.value}) выполнена: views={views}, likes={likes}, comments={comments}, shares={shares}")
+        if job.job_class == JobClass.INTERACTIVE:
+            ttfm = (now - job.created_at).total_seconds()
+            logger.info(f"⚡ Задача #{job.id}: time-to-first-metric {ttfm:.1f}s")
 
         # Telegram уведомления (async в sync контексте)
         import asyncio
         try:
-            from app.models.user import User
-            user = db.query(User).filter(User.id == job.user_id).first()
             if user:
                 asyncio.run(send_telegram_notification(user, reel, metrics, old_views))
         except Exception as e:
@@ -166,7 +196,7 @@ def process_one_job(db: Session) -> bool:
 
     except Exception as e:
         logger.error(f"❌ Ошибка задачи #{job.id}: {e}")
-        fail_job(db, job, str(e))
+        writer.fail({"job_id": job.id, "started_at": job.started_at, "user_id": job.user_id, "reel_id": job.reel_id, "error_message": str(e), "completed_at": datetime.utcnow()})
         return True
 
 
@@ -180,6 +210,9 @@ def run_worker_loop(poll_interval: int = 5):
     logger.info("🚀 Parser Worker запущен")
     consecutive_errors = 0
 
+    writer = ResultWriter()
+    writer.start()
+
     check_count = 0
     while True:
         db = None
@@ -189,8 +222,9 @@ def run_worker_loop(poll_interval: int = 5):
             if check_count % 12 == 1:  # Логируем каждую минуту (12 * 5 сек)
                 from app.models.parsing import ParseJob, JobStatus
                 pending = db.query(ParseJob).filter(ParseJob.status == JobStatus.PENDING).count()
-                logger.info(f"📋 Проверка очереди #{check_count}: {pending} задач в ожидании")
-            processed = process_one_job(db)
+                lag = get_queue_lag_by_tariff(db)
+                logger.info(f"📋 Проверка очереди #{check_count}: {pending} задач в ожидании, лаг по тарифам: {lag}")
+            processed = process_one_job(db, writer)
             consecutive_errors = 0  # Сброс счётчика ошибок при успехе
             if not processed:
                 # Очередь пуста — ждём
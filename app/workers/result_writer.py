@@ -0,0 +1,176 @@
+"""
+Result writer — копит результаты воркера и пишет их в БД пачками
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.database import SessionLocal
+from app.services.parsing_service import persist_job_results, requeue_expired_jobs, renew_job_leases
+
+logger = logging.getLogger(__name__)
+
+# Пачка пишется, когда набралось RESULT_BATCH_SIZE результатов
+# или самый старый из них ждёт RESULT_FLUSH_SECONDS
+RESULT_BATCH_SIZE = 50
+RESULT_FLUSH_SECONDS = 2.0
+
+# Потолок буфера: пока БД недоступна, воркеры блокируются на complete/fail
+RESULT_BUFFER_LIMIT = 5000
+
+# Как часто продлевать аренду буферизованных задач и возвращать в очередь истёкшие
+LEASE_CHECK_SECONDS = 60
+
+# Ошибки соединения: пачка цела, повторить позже. Остальные — ошибка данных
+# конкретного результата, её ищем делением пачки
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+class ResultWriter:
+    """
+    Буфер результатов парсинга с фоновым сбросом одной транзакцией.
+
+    Пока результат в буфере, его задача остаётся RUNNING, а аренда
+    продлевается (heartbeat_at): повторного парсинга нет, а если процесс
+    упадёт до записи, аренда истечёт и задачу перепарсят
+    (requeue_expired_jobs). При недоступной БД пачка остаётся в буфере;
+    если пачку отвергает сама БД (переполнение, нет секции), она делится
+    пополам до виновного результата, и его задача помечается FAILED.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = RESULT_BATCH_SIZE,
+        flush_seconds: float = RESULT_FLUSH_SECONDS,
+        buffer_limit: int = RESULT_BUFFER_LIMIT,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer_limit = buffer_limit
+        self._queue = queue.Queue(maxsize=buffer_limit)
+        self._buffered = set()  # job_id результатов, ещё не записанных в БД
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def complete(self, result: dict):
+        """Поставить успешный результат на запись (см. persist_job_results)"""
+        self._put("completed", result)
+
+    def fail(self, result: dict):
+        """Поставить ошибку задачи на запись"""
+        self._put("failed", result)
+
+    def _put(self, kind: str, result: dict):
+        with self._lock:
+            self._buffered.add(result["job_id"])
+        self._queue.put((kind, result))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="result-writer")
+        self._thread.start()
+        logger.info("💾 Result writer запущен")
+        return self._thread
+
+    def _run(self):
+        pending = []
+        deadline = None
+        last_lease_check = 0.0
+
+        while True:
+            timeout = self.flush_seconds if deadline is None else max(0.0, deadline - time.monotonic())
+            if len(pending) < self.buffer_limit:
+                try:
+                    item = self._queue.get(timeout=timeout)
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_seconds
+                except queue.Empty:
+                    pass
+            else:
+                time.sleep(timeout)
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if pending and (len(pending) >= self.batch_size or due):
+                pending = self._flush(pending)
+                deadline = time.monotonic() + self.flush_seconds if pending else None
+
+            if time.monotonic() - last_lease_check >= LEASE_CHECK_SECONDS:
+                last_lease_check = time.monotonic()
+                self._check_leases()
+
+    def _flush(self, items: list) -> list:
+        """Записать пачку; вернуть то, что записать не удалось и стоит повторить"""
+        try:
+            self._persist(items)
+            logger.info(f"💾 Записано результатов: {len(items)}")
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Result writer: БД недоступна ({len(items)} в буфере): {e}")
+            return items
+        except Exception as e:
+            if len(items) > 1:
+                middle = len(items) // 2
+                return self._flush(items[:middle]) + self._flush(items[middle:])
+            return self._reject(items[0], e)
+
+        self._forget(items)
+        return []
+
+    def _reject(self, item: tuple, error: Exception) -> list:
+        """Результат, который БД не принимает: задача — FAILED с текстом ошибки"""
+        kind, result = item
+        logger.error(f"Result writer: результат задачи #{result['job_id']} отвергнут БД: {error}")
+        failed = {
+            "job_id": result["job_id"],
+            "started_at": result["started_at"],
+            "user_id": result["user_id"],
+            "reel_id": result["reel_id"],
+            "error_message": f"Ошибка записи результата: {error}"[:1000],
+            "completed_at": datetime.utcnow(),
+        }
+        try:
+            self._persist([("failed", failed)])
+        except TRANSIENT_ERRORS:
+            return [item]
+        except Exception as e:
+            # Не записать даже ошибку: бросаем, аренда истечёт и задачу перепарсят
+            logger.error(f"Result writer: задача #{result['job_id']} не помечена FAILED: {e}")
+        self._forget([item])
+        return []
+
+    def _persist(self, items: list):
+        completed = [result for kind, result in items if kind == "completed"]
+        failed = [result for kind, result in items if kind == "failed"]
+
+        db = SessionLocal()
+        try:
+            persist_job_results(db, completed, failed)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _forget(self, items: list):
+        with self._lock:
+            self._buffered.difference_update(result["job_id"] for _, result in items)
+
+    def _check_leases(self):
+        with self._lock:
+            buffered = list(self._buffered)
+
+        db = SessionLocal()
+        try:
+            renew_job_leases(db, buffered)
+            count = requeue_expired_jobs(db)
+            if count:
+                logger.warning(f"🔄 Возвращено в очередь задач с истёкшей арендой: {count}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Lease check error: {e}")
+        finally:
+            db.close()
@@ -1,92 +1,131 @@
 """
 Scheduler — периодически ставит рилсы в очередь на парсинг
-по интервалу тарифа каждого юзера
+по интервалу тарифа (reels.next_parse_at)
 """
 
 import logging
 import time
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models.user import User
+from app.models.user import User, TariffType
 from app.models.reel import Reel
-from app.models.parsing import ParseJob, JobStatus
-from app.services.tariff_service import get_parse_interval, get_priority
-from app.services.parsing_service import create_parse_job
+from app.models.parsing import ParseJob, JobStatus, JobClass, JobType, ACTIVE_JOB_STATUSES
+from app.services.tariff_service import TARIFF_LIMITS
+from app.services.parsing_service import insert_parse_jobs, ENQUEUE_BATCH_SIZE
+from app.services.schedule_service import next_parse_time_sql, reel_parse_interval_sql, update_parse_budgets
+from app.services.history_service import (
+    rollup_hourly,
+    rollup_daily,
+    apply_history_retention,
+    ensure_history_partitions,
+    pack_history,
+)
+from app.services.stats_service import update_growth_deltas
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+# Бюджеты адаптивного расписания пересчитываются раз в ~10 минут (при тике 30с)
+BUDGET_CHECK_EVERY_TICKS = 20
 
-def schedule_user_reels(db: Session, user: User):
-    """Проверить и поставить рилсы юзера в очередь если прошёл интервал"""
-    interval = get_parse_interval(user)
-
-    # Ищем последнюю завершённую задачу юзера
-    last_job = db.query(ParseJob).filter(
-        ParseJob.user_id == user.id,
-        ParseJob.status == JobStatus.COMPLETED,
-    ).order_by(ParseJob.completed_at.desc()).first()
-
-    # Проверяем, прошёл ли интервал
-    if last_job and last_job.completed_at:
-        next_time = last_job.completed_at + timedelta(minutes=interval)
-        if datetime.utcnow() < next_time:
-            return 0  # Ещё рано
-
-    # Проверяем, нет ли уже pending задач
-    pending = db.query(ParseJob).filter(
-        ParseJob.user_id == user.id,
-        ParseJob.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
-    ).count()
-    if pending > 0:
-        return 0  # Уже есть задачи в работе
-
-    # Ставим все активные рилсы в очередь
-    reels = db.query(Reel).filter(
-        Reel.user_id == user.id,
-        Reel.enabled == True,
-    ).all()
+# Ретенция истории — раз в час (при проходе обслуживания раз в 5 минут)
+RETENTION_EVERY_TICKS = 12
 
-    count = 0
-    for reel in reels:
-        create_parse_job(db, user, reel)
-        count += 1
 
-    if count > 0:
-        logger.info(f"📋 Юзер {user.email}: поставлено {count} рилсов в очередь")
+def schedule_due_reels(db: Session, tariff: TariffType, now: datetime) -> int:
+    """
+    Поставить в очередь все созревшие рилсы юзеров одного тарифа.
+
+    Два set-based запроса вместо обхода юзеров: UPDATE сдвигает next_parse_at
+    у созревших рилсов без активной задачи на следующий слот их фазы
+    по интервалу рилса (адаптивному, если включён; см. schedule_service)
+    и возвращает их, затем insert_parse_jobs создаёт задачи пачками по
+    ENQUEUE_BATCH_SIZE (ON CONFLICT DO NOTHING). Задача полная,
+    если у рилса наступил next_full_parse_at, иначе lite.
+    """
+    limits = TARIFF_LIMITS[tariff]
+    next_time = next_parse_time_sql(Reel.id, reel_parse_interval_sql(limits["parse_interval_minutes"]), now)
+
+    active_job = select(ParseJob.id).where(
+        ParseJob.reel_id == Reel.id,
+        ParseJob.status.in_(ACTIVE_JOB_STATUSES),
+    ).exists()
+
+    # UPDATE ... FROM users: интервал рилса зависит от бюджета юзера
+    due = db.execute(
+        update(Reel)
+        .where(
+            Reel.enabled == True,
+            Reel.next_parse_at <= now,
+            User.id == Reel.user_id,
+            User.is_active == True,
+            User.tariff == tariff,
+            ~active_job,
+        )
+        .values(next_parse_at=next_time)
+        .returning(Reel.id, Reel.user_id, Reel.next_full_parse_at)
+        .execution_options(synchronize_session=False)
+    ).all()
 
-    return count
+    created = 0
+    for i in range(0, len(due), ENQUEUE_BATCH_SIZE):
+        created += insert_parse_jobs(db, [
+            {
+                "reel_id": reel_id,
+                "user_id": user_id,
+                "status": JobStatus.PENDING,
+                "priority": limits["priority"],
+                "job_class": JobClass.SCHEDULED,
+                "job_type": JobType.FULL if next_full_parse_at <= now else JobType.LITE,
+                "created_at": now,
+            }
+            for reel_id, user_id, next_full_parse_at in due[i:i + ENQUEUE_BATCH_SIZE]
+        ])
+    return created
 
 
 def scheduler_tick():
-    """Один тик шедулера — проверяет всех активных юзеров"""
+    """Один тик шедулера — ставит в очередь все рилсы, у которых наступил next_parse_at"""
     db = SessionLocal()
     try:
-        users = db.query(User).filter(User.is_active == True).all()
+        now = datetime.utcnow()
         total_scheduled = 0
 
-        for user in users:
-            reels_count = db.query(Reel).filter(
-                Reel.user_id == user.id,
-                Reel.enabled == True,
-            ).count()
-            if reels_count == 0:
-                continue
-
-            count = schedule_user_reels(db, user)
+        for tariff in TARIFF_LIMITS:
+            count = schedule_due_reels(db, tariff, now)
+            if count > 0:
+                logger.info(f"📋 Тариф {tariff.value}: поставлено {count} рилсов в очередь")
             total_scheduled += count
 
+        db.commit()
+
         if total_scheduled > 0:
             logger.info(f"📊 Scheduler: поставлено {total_scheduled} задач суммарно")
 
     except Exception as e:
+        db.rollback()
         logger.error(f"Scheduler error: {e}")
     finally:
         db.close()
 
 
+def budget_tick():
+    """Пересчёт бюджетов адаптивного расписания (полный проход по рилсам — редко)"""
+    db = SessionLocal()
+    try:
+        update_parse_budgets(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Budget update error: {e}")
+    finally:
+        db.close()
+
+
 def run_scheduler_loop(check_interval: int = 30):
     """
     Основной цикл шедулера.
@@ -96,11 +135,15 @@ def run_scheduler_loop(check_interval: int = 30):
     """
     logger.info("⏰ Scheduler запущен")
 
+    tick = 0
     while True:
         try:
             scheduler_tick()
+            if settings.ADAPTIVE_SCHEDULING and tick % BUDGET_CHECK_EVERY_TICKS == 0:
+                budget_tick()
         except Exception as e:
             logger.error(f"Scheduler loop error: {e}")
+        tick += 1
         time.sleep(check_interval)
 
 
@@ -117,6 +160,60 @@ def start_scheduler_thread(check_interval: int = 30):
     return thread
 
 
+def history_tick(with_retention: bool = False):
+    """Инкрементальные rollups истории (+ ретенция) в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        ensure_history_partitions(db, now)
+        hourly = rollup_hourly(db, now)
+        daily = rollup_daily(db)
+        if hourly or daily:
+            logger.info(f"🗜 Rollups: часовых корзин {hourly}, дневных {daily}")
+            update_growth_deltas(db, now)
+        packed = pack_history(db, now)
+        if packed:
+            logger.info(f"🗜 Упаковано дней истории: {packed}")
+        if with_retention:
+            deleted = apply_history_retention(db, now)
+            logger.info(
+                f"🧹 Ретенция истории: секций {deleted['partitions']}, "
+                f"сырых {deleted['raw']}, упакованных дней {deleted['packed']}, часовых {deleted['hourly']}"
+            )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"History maintenance error: {e}")
+    finally:
+        db.close()
+
+
+def run_history_loop(check_interval: int = 300):
+    """
+    Цикл обслуживания истории: rollups каждые check_interval секунд,
+    ретенция — раз в RETENTION_EVERY_TICKS проходов.
+    """
+    logger.info("🗜 History maintenance запущен")
+
+    tick = 0
+    while True:
+        history_tick(with_retention=tick % RETENTION_EVERY_TICKS == 0)
+        tick += 1
+        time.sleep(check_interval)
+
+
+def start_history_thread(check_interval: int = 300):
+    """Запустить обслуживание истории в отдельном потоке (не задерживает тики шедулера)"""
+    thread = threading.Thread(
+        target=run_history_loop,
+        args=(check_interval,),
+        daemon=True,
+        name="history-maintenance",
+    )
+    thread.start()
+    logger.info("🗜 History maintenance thread запущен")
+    return thread
+
+
 def start_worker_thread(poll_interval: int = 5):
     """Запустить воркер парсинга в отдельном потоке"""
     from app.workers.parser_worker import run_worker_loop